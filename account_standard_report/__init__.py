@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+from . import controllers
 from . import wizard
 from . import report
 from . import models
@@ -10,14 +10,17 @@
     'depends': ['account', 'report_xlsx'],
     'data': [
         'security/ir.model.access.csv',
+        'security/account_standard_report_security.xml',
         'data/report_paperformat.xml',
         'data/data_account_standard_report.xml',
         'data/res_currency_data.xml',
+        'data/ir_cron_data.xml',
         'report/report_account_standard_report.xml',
         'views/account_view.xml',
         'views/account_standard.xml',
         'views/account_standard_report_template_view.xml',
         'views/res_currency_views.xml',
+        'views/account_standard_report_job_view.xml',
         'wizard/account_standard_report_view.xml',
     ],
     'demo': [],
@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+""" Benchmark of the Standard Report, not loaded with the module.
+
+Run it from an Odoo shell on a throwaway database, see README.md. """
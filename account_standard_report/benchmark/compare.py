@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+""" Compare two results of the benchmark, without Odoo:
+
+    python3 account_standard_report/benchmark/compare.py before.json after.json
+"""
+
+import json
+import sys
+
+
+def compare(before, after):
+    """ Return the lines of the comparison of the timings of two results. """
+    lines = ['%-20s %-26s %10s %10s %8s' % ('report', 'step', 'before', 'after', 'ratio')]
+    previous = {(r['ledger_type'], r['summary']): r for r in before['results']}
+    for result in after['results']:
+        old = previous.get((result['ledger_type'], result['summary']))
+        if not old:
+            continue
+        name = '%s%s' % (result['ledger_type'], ' summary' if result['summary'] else '')
+        steps = [(key, old[key], result[key]) for key in ('compute', 'xlsx', 'pdf') if key in old and key in result]
+        steps += [('  ' + stage, old['stages'][stage]['time'], values['time'])
+                  for stage, values in sorted(result['stages'].items()) if stage in old['stages']]
+        for step, old_time, new_time in steps:
+            ratio = new_time / old_time if old_time else float('inf')
+            lines.append('%-20s %-26s %10.3f %10.3f %7.2fx' % (name, step, old_time, new_time, ratio))
+    return lines
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit(__doc__)
+    with open(sys.argv[1]) as f_before, open(sys.argv[2]) as f_after:
+        print('\n'.join(compare(json.load(f_before), json.load(f_after))))
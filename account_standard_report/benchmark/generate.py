@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+""" Synthetic journal entries for the benchmark.
+
+The entries are inserted in SQL by pairs: an invoice on a receivable or
+payable account, and its payment some days later. A part of the pairs is
+fully reconciled. All the generated records have the reference BENCH. """
+
+import logging
+from datetime import date
+
+_logger = logging.getLogger(__name__)
+
+
+def generate(env, pairs=100000, partners=1000, analytic_accounts=20, reconcile_ratio=0.6,
+             date_from=date(2015, 1, 1), date_to=date(2019, 12, 31), seed=0.42, company=None):
+    """ Insert `pairs` invoices and payments (4 journal items each) in the
+    company of the user, and commit. """
+    cr = env.cr
+    company = company or env.user.company_id
+    _ensure_data(env, company, partners, analytic_accounts)
+
+    cr.execute("SELECT setseed(%s)", (seed,))
+    ids = _get_ids(env, company)
+    # keep the names of the entries unique over several generations
+    cr.execute("SELECT COALESCE(MAX(id), 0) FROM account_move")
+    offset = cr.fetchone()[0]
+    _logger.info('Generating %s pairs of entries', pairs)
+    cr.execute("DROP TABLE IF EXISTS bench_pair")
+    cr.execute("""
+        CREATE TEMP TABLE bench_pair ON COMMIT DROP AS
+        SELECT
+            i,
+            %(date_from)s::date + floor(random() * %(days)s)::int AS date,
+            floor(random() * 90)::int AS delay,
+            (%(partners)s::int[])[1 + floor(random() * %(n_partners)s)::int] AS partner_id,
+            (%(third_accounts)s::int[])[1 + floor(random() * %(n_third_accounts)s)::int] AS third_account_id,
+            (%(accounts)s::int[])[1 + floor(random() * %(n_accounts)s)::int] AS account_id,
+            (%(invoice_journals)s::int[])[1 + floor(random() * %(n_invoice_journals)s)::int] AS invoice_journal_id,
+            (%(bank_journals)s::int[])[1 + floor(random() * %(n_bank_journals)s)::int] AS bank_journal_id,
+            CASE WHEN random() < 0.5 THEN (%(analytics)s::int[])[1 + floor(random() * %(n_analytics)s)::int] END AS analytic_account_id,
+            round((random() * 10000)::numeric, 2) + 0.01 AS amount,
+            random() < %(ratio)s AS reconciled
+        FROM
+            generate_series(%(offset)s + 1, %(offset)s + %(pairs)s) i
+    """, dict(ids, date_from=date_from, days=(date_to - date_from).days + 1, offset=offset, pairs=pairs, ratio=reconcile_ratio,
+              **{'n_%s' % key: len(value) for key, value in ids.items()}))
+
+    # the payment is dated at most date_to
+    cr.execute("""
+        INSERT INTO account_move
+            (name, ref, date, journal_id, company_id, currency_id, state, amount, matched_percentage,
+             create_uid, create_date, write_uid, write_date)
+        SELECT
+            'BENCH/' || p.i || '/' || t.kind,
+            'BENCH',
+            CASE WHEN t.kind = 1 THEN p.date ELSE LEAST(p.date + p.delay, %(date_to)s::date) END,
+            CASE WHEN t.kind = 1 THEN p.invoice_journal_id ELSE p.bank_journal_id END,
+            %(company)s, %(currency)s, 'posted', p.amount,
+            CASE WHEN p.reconciled THEN 1 ELSE 0 END,
+            %(uid)s, NOW(), %(uid)s, NOW()
+        FROM
+            bench_pair p, (VALUES (1), (2)) t (kind)
+    """, {'date_to': date_to, 'company': company.id, 'currency': company.currency_id.id, 'uid': env.uid})
+
+    cr.execute("""
+        INSERT INTO account_full_reconcile (name, create_uid, create_date, write_uid, write_date)
+        SELECT 'BENCH/' || i, %(uid)s, NOW(), %(uid)s, NOW()
+        FROM bench_pair
+        WHERE reconciled
+    """, {'uid': env.uid})
+
+    # invoice: third party / account, payment: bank / third party
+    cr.execute("""
+        INSERT INTO account_move_line
+            (name, ref, move_id, journal_id, date, date_maturity, company_id, company_currency_id,
+             account_id, user_type_id, partner_id, analytic_account_id, quantity,
+             debit, credit, balance, debit_cash_basis, credit_cash_basis, balance_cash_basis,
+             amount_currency, amount_residual, reconciled, blocked, tax_exigible, full_reconcile_id,
+             create_uid, create_date, write_uid, write_date)
+        SELECT
+            'BENCH', 'BENCH', m.id, m.journal_id, m.date, p.date + 30, m.company_id, m.currency_id,
+            l.account_id, acc.user_type_id, p.partner_id, l.analytic_account_id, 1,
+            l.debit, l.credit, l.debit - l.credit, l.debit, l.credit, l.debit - l.credit,
+            0, CASE WHEN l.full_reconcile_id IS NULL AND l.third THEN l.debit - l.credit ELSE 0 END,
+            l.full_reconcile_id IS NOT NULL, FALSE, TRUE, l.full_reconcile_id,
+            %(uid)s, NOW(), %(uid)s, NOW()
+        FROM
+            bench_pair p
+            LEFT JOIN account_full_reconcile afr ON (afr.name = 'BENCH/' || p.i)
+            INNER JOIN account_journal j ON (j.id = p.bank_journal_id)
+            CROSS JOIN LATERAL (VALUES
+                (1, TRUE, p.third_account_id, NULL::int, p.amount, 0, afr.id),
+                (1, FALSE, p.account_id, p.analytic_account_id, 0, p.amount, NULL),
+                (2, FALSE, j.default_debit_account_id, NULL, p.amount, 0, NULL),
+                (2, TRUE, p.third_account_id, NULL, 0, p.amount, afr.id)
+            ) l (kind, third, account_id, analytic_account_id, debit, credit, full_reconcile_id)
+            INNER JOIN account_account acc ON (acc.id = l.account_id)
+            INNER JOIN account_move m ON (m.name = 'BENCH/' || p.i || '/' || l.kind)
+    """, {'uid': env.uid})
+
+    cr.execute("""
+        UPDATE account_full_reconcile afr
+        SET min_date = aml.min_date, max_date = aml.max_date
+        FROM (
+            SELECT full_reconcile_id, MIN(date) AS min_date, MAX(date) AS max_date
+            FROM account_move_line
+            WHERE full_reconcile_id IS NOT NULL AND ref = 'BENCH'
+            GROUP BY full_reconcile_id
+        ) aml
+        WHERE aml.full_reconcile_id = afr.id
+    """)
+    env['account.report.balance.snapshot']._rebuild(company)
+    cr.execute("ANALYZE account_move_line")
+    cr.commit()
+    env.clear()
+    _logger.info('%s journal items generated', 4 * pairs)
+
+
+def _ensure_data(env, company, partners, analytic_accounts):
+    """ Create the missing partners and analytic accounts, and flag the
+    third parties accounts. """
+    partner_obj = env['res.partner']
+    missing = partners - partner_obj.search_count([('ref', '=like', 'BENCH%')])
+    if missing > 0:
+        partner_obj.create([{'name': 'Bench partner %s' % i, 'ref': 'BENCH%s' % i, 'is_company': True}
+                            for i in range(missing)])
+    analytic_obj = env['account.analytic.account']
+    missing = analytic_accounts - analytic_obj.search_count([('code', '=like', 'BENCH%')])
+    if missing > 0:
+        analytic_obj.create([{'name': 'Bench %s' % i, 'code': 'BENCH%s' % i, 'company_id': company.id}
+                             for i in range(missing)])
+    for internal_type, third_parties in (('receivable', 'customer'), ('payable', 'supplier')):
+        env['account.account'].search([('company_id', '=', company.id),
+                                       ('internal_type', '=', internal_type),
+                                       ('type_third_parties', '=', 'no')]).write({'type_third_parties': third_parties})
+
+
+def _get_ids(env, company):
+    account_obj = env['account.account']
+    journal_obj = env['account.journal']
+    company_domain = [('company_id', '=', company.id)]
+    return {
+        'partners': env['res.partner'].search([('ref', '=like', 'BENCH%')]).ids,
+        'analytics': env['account.analytic.account'].search([('code', '=like', 'BENCH%')]).ids,
+        'third_accounts': account_obj.search(company_domain + [('type_third_parties', 'in', ('customer', 'supplier'))]).ids,
+        'accounts': account_obj.search(company_domain + [('deprecated', '=', False),
+                                                         ('internal_type', '=', 'other')]).ids,
+        'invoice_journals': journal_obj.search(company_domain + [('type', 'in', ('sale', 'purchase'))]).ids,
+        'bank_journals': journal_obj.search(company_domain + [('type', 'in', ('bank', 'cash')),
+                                                              ('default_debit_account_id', '!=', False)]).ids,
+    }
+
+
+def clean(env, company=None):
+    """ Delete the generated entries, and commit. """
+    company = company or env.user.company_id
+    cr = env.cr
+    cr.execute("DELETE FROM account_move_line WHERE ref = 'BENCH' AND company_id = %s", (company.id,))
+    cr.execute("DELETE FROM account_move WHERE ref = 'BENCH' AND company_id = %s", (company.id,))
+    cr.execute("DELETE FROM account_full_reconcile WHERE name LIKE 'BENCH/%%' "
+               "AND id NOT IN (SELECT full_reconcile_id FROM account_move_line WHERE full_reconcile_id IS NOT NULL)")
+    env['account.report.balance.snapshot']._rebuild(company)
+    cr.commit()
+    env.clear()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+""" Time every ledger type of the Standard Report, in detail and summary
+mode, with the Excel and PDF rendering, and write the results in JSON.
+
+Nothing is committed: the reports are computed in one transaction which
+is rolled back at the end. """
+
+import json
+import logging
+import os
+import subprocess
+import time
+from datetime import date, datetime
+
+_logger = logging.getLogger(__name__)
+
+LEDGER_TYPES = ['general', 'partner', 'journal', 'open', 'aged', 'analytic']
+
+REPORT_ACTIONS = {'xlsx': 'account_standard_report.action_standard_excel',
+                  'pdf': 'account_standard_report.action_standard_report',
+                  }
+
+
+def run(env, output=None, ledger_types=None, summaries=(False, True), formats=('xlsx',), repeat=1,
+        date_from=date(2019, 1, 1), date_to=date(2019, 12, 31), user='base.user_admin'):
+    """ Compute each report `repeat` times and return the results, written
+    in the JSON file `output` if given. """
+    env = env(user=env.ref(user).id)
+    # every computation must run the SQL pipeline
+    env['ir.config_parameter'].set_param('account_standard_report.cache_max_age', '0')
+    env.cr.execute("SELECT COUNT(*) FROM account_move_line WHERE company_id = %s", (env.user.company_id.id,))
+    move_lines = env.cr.fetchone()[0]
+
+    results = []
+    for ledger_type in ledger_types or LEDGER_TYPES:
+        for summary in summaries:
+            result = {'ledger_type': ledger_type, 'summary': summary, 'compute': [], 'stages': {}}
+            for report_format in formats:
+                result[report_format] = []
+            for i in range(repeat):
+                _run_one(env, result, ledger_type, summary, formats, date_from, date_to)
+            for key in ['compute'] + list(formats):
+                result[key] = min(result[key])
+            _logger.info('%s%s: %.3fs', ledger_type, ' summary' if summary else '', result['compute'])
+            results.append(result)
+    env.cr.rollback()
+
+    data = {
+        'date': datetime.now().isoformat(),
+        'database': env.cr.dbname,
+        'revision': _get_revision(),
+        'move_lines': move_lines,
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'repeat': repeat,
+        'results': results,
+    }
+    if output:
+        with open(output, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+    return data
+
+
+def _run_one(env, result, ledger_type, summary, formats, date_from, date_to):
+    wizard = env['account.report.standard.ledger'].create({
+        'ledger_type': ledger_type,
+        'summary': summary,
+        'date_from': date_from,
+        'date_to': date_to,
+        'result_selection': 'customer_supplier',
+        'reconciled': False,
+    })
+    start = time.time()
+    wizard._compute_data()
+    result['compute'].append(time.time() - start)
+    for report_format in formats:
+        start = time.time()
+        env.ref(REPORT_ACTIONS[report_format]).render(wizard.ids)
+        result[report_format].append(time.time() - start)
+    # keep the fastest run of each stage, as for the totals
+    for stat in wizard.report_id.stat_ids:
+        stage = result['stages'].get(stat.stage)
+        if not stage or stat.duration < stage['time']:
+            result['stages'][stat.stage] = {'time': stat.duration, 'rows': stat.row_count}
+    wizard.report_id.unlink()
+
+
+def _get_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(__file__),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
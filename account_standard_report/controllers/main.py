@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+import tempfile
+
+from werkzeug.exceptions import NotFound
+
+from odoo import http
+from odoo.http import request
+
+EXPORT_MIMETYPES = {'csv': 'text/csv',
+                    'parquet': 'application/octet-stream',
+                    }
+
+
+class StandardReportController(http.Controller):
+
+    @http.route('/account_standard_report/export/<int:wizard_id>/<string:export_format>', type='http', auth='user')
+    def export_report(self, wizard_id, export_format, **kw):
+        """ Send the lines of a computed report from a temporary file, without
+        loading them in memory. """
+        wizard = request.env['account.report.standard.ledger'].browse(wizard_id).exists()
+        if not wizard or export_format not in EXPORT_MIMETYPES:
+            raise NotFound()
+        wizard.check_access_rule('read')
+        wizard._compute_data()
+        fileobj = tempfile.TemporaryFile()
+        wizard._export_line_for_report(fileobj, export_format)
+        fileobj.seek(0)
+        return http.send_file(fileobj, mimetype=EXPORT_MIMETYPES[export_format], as_attachment=True,
+                              filename='%s.%s' % (wizard.report_id.report_name, export_format), cache_timeout=0)
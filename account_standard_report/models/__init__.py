@@ -3,3 +3,9 @@
 from . import account
 from . import res_currency
 from . import account_standard_report_template
+from . import res_company
+from . import account_move
+from . import account_move_line
+from . import account_balance_snapshot
+from . import account_full_reconcile
+from . import account_standard_report_job
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, models, fields
+
+
+class AccountBalanceSnapshot(models.Model):
+    _name = 'account.report.balance.snapshot'
+    _description = 'Account Balance Snapshot'
+    _log_access = False
+
+    company_id = fields.Many2one('res.company', 'Company', required=True, ondelete='cascade')
+    account_id = fields.Many2one('account.account', 'Account', required=True, ondelete='cascade')
+    partner_id = fields.Many2one('res.partner', 'Partner', ondelete='cascade')
+    period = fields.Date('Period', required=True, help='First day of the month of the summed entries.')
+    debit = fields.Float(default=0.0)
+    credit = fields.Float(default=0.0)
+    balance = fields.Float(default=0.0)
+
+    @api.model_cr
+    def init(self):
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS account_report_balance_snapshot_key_uniq
+            ON account_report_balance_snapshot (company_id, account_id, (COALESCE(partner_id, 0)), period)
+        """)
+
+    @api.model
+    def _rebuild(self, companies):
+        """ Recompute the snapshots of `companies` from the posted entries,
+        and enable their incremental update. The entries are summed without
+        lock, then the snapshots of each company replaced under a short
+        lock. Commits the transaction. """
+        if not companies:
+            return
+        cr = self.env.cr
+        # the sum of the entries less the snapshots read in the same query:
+        # adding the snapshots of the replacement keeps the moves posted or
+        # cancelled since the sum
+        cr.execute("DROP TABLE IF EXISTS account_report_balance_snapshot_rebuild")
+        cr.execute("""
+            CREATE TEMPORARY TABLE account_report_balance_snapshot_rebuild AS
+            SELECT
+                aml.company_id,
+                aml.account_id,
+                aml.partner_id,
+                date_trunc('month', aml.date)::date AS period,
+                COALESCE(SUM(aml.debit), 0) AS debit,
+                COALESCE(SUM(aml.credit), 0) AS credit,
+                COALESCE(SUM(aml.balance), 0) AS balance
+            FROM
+                account_move_line aml
+                INNER JOIN account_move m ON (aml.move_id = m.id)
+            WHERE
+                m.state = 'posted'
+                AND aml.company_id IN %s
+            GROUP BY
+                aml.company_id, aml.account_id, aml.partner_id, period
+            UNION ALL
+            SELECT company_id, account_id, partner_id, period, -debit, -credit, -balance
+            FROM account_report_balance_snapshot
+            WHERE company_id IN %s
+        """, (tuple(companies.ids), tuple(companies.ids)))
+        # the moves of a company posted during its first sum are only
+        # counted by the next rebuild, as its snapshots were not enabled
+        cr.commit()
+        for company in companies:
+            # locked before any query, so that the snapshot of the
+            # transaction sees the moves committed until then; blocks the
+            # incremental updates of concurrent postings until the commit
+            cr.execute("LOCK TABLE account_report_balance_snapshot IN SHARE ROW EXCLUSIVE MODE")
+            cr.execute("""
+                INSERT INTO account_report_balance_snapshot_rebuild
+                SELECT company_id, account_id, partner_id, period, debit, credit, balance
+                FROM account_report_balance_snapshot
+                WHERE company_id = %s
+            """, (company.id,))
+            cr.execute("DELETE FROM account_report_balance_snapshot WHERE company_id = %s", (company.id,))
+            cr.execute("""
+                INSERT INTO account_report_balance_snapshot
+                    (company_id, account_id, partner_id, period, debit, credit, balance)
+                SELECT company_id, account_id, partner_id, period, SUM(debit), SUM(credit), SUM(balance)
+                FROM account_report_balance_snapshot_rebuild
+                WHERE company_id = %s
+                GROUP BY company_id, account_id, partner_id, period
+                HAVING SUM(debit) != 0 OR SUM(credit) != 0
+            """, (company.id,))
+            company.sudo().write({'balance_snapshot_date': fields.Datetime.now()})
+            cr.commit()
+        cr.execute("DROP TABLE account_report_balance_snapshot_rebuild")
+
+    @api.model
+    def _apply_moves(self, moves, sign):
+        """ Add (sign=1) or remove (sign=-1) the lines of `moves` from the
+        snapshots of the companies where they are enabled. """
+        if moves:
+            self._apply('aml.move_id IN %s', tuple(moves.ids), sign)
+
+    @api.model
+    def _apply_lines(self, lines, sign):
+        """ Add (sign=1) or remove (sign=-1) the journal items `lines` from
+        the snapshots of the companies where they are enabled. """
+        if lines:
+            self._apply('aml.id IN %s', tuple(lines.ids), sign)
+
+    def _apply(self, where, ids, sign):
+        self.env.cr.execute("""
+            INSERT INTO account_report_balance_snapshot AS snap
+                (company_id, account_id, partner_id, period, debit, credit, balance)
+            SELECT
+                aml.company_id,
+                aml.account_id,
+                aml.partner_id,
+                date_trunc('month', aml.date)::date AS period,
+                %s * COALESCE(SUM(aml.debit), 0),
+                %s * COALESCE(SUM(aml.credit), 0),
+                %s * COALESCE(SUM(aml.balance), 0)
+            FROM
+                account_move_line aml
+                INNER JOIN res_company c ON (aml.company_id = c.id)
+            WHERE
+                """ + where + """
+                AND c.balance_snapshot_date IS NOT NULL
+            GROUP BY
+                aml.company_id, aml.account_id, aml.partner_id, period
+            ON CONFLICT (company_id, account_id, (COALESCE(partner_id, 0)), period) DO UPDATE SET
+                debit = snap.debit + EXCLUDED.debit,
+                credit = snap.credit + EXCLUDED.credit,
+                balance = snap.balance + EXCLUDED.balance
+        """, (sign, sign, sign, ids))
+
+    @api.model
+    def _cron_rebuild(self):
+        self._rebuild(self.env['res.company'].search([]))
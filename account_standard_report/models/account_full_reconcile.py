@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, models, fields
+from odoo.tools.sql import column_exists, create_column
+
+
+class AccountFullReconcile(models.Model):
+    _inherit = 'account.full.reconcile'
+
+    min_date = fields.Date('First Matched Date', compute='_compute_dates', store=True,
+                           help='Date of the oldest journal item of this matching.')
+    max_date = fields.Date('Last Matched Date', compute='_compute_dates', store=True, index=True,
+                           help='Date of the most recent journal item of this matching.')
+
+    def _auto_init(self):
+        # fill the columns in SQL, computing them with the ORM on install
+        # would read every reconciled journal item
+        cr = self.env.cr
+        if not column_exists(cr, 'account_full_reconcile', 'max_date'):
+            create_column(cr, 'account_full_reconcile', 'min_date', 'date')
+            create_column(cr, 'account_full_reconcile', 'max_date', 'date')
+            cr.execute("""
+                UPDATE account_full_reconcile afr
+                SET min_date = aml.min_date, max_date = aml.max_date
+                FROM (
+                    SELECT full_reconcile_id, MIN(date) AS min_date, MAX(date) AS max_date
+                    FROM account_move_line
+                    WHERE full_reconcile_id IS NOT NULL
+                    GROUP BY full_reconcile_id
+                ) aml
+                WHERE aml.full_reconcile_id = afr.id
+            """)
+        return super(AccountFullReconcile, self)._auto_init()
+
+    @api.depends('reconciled_line_ids.date')
+    def _compute_dates(self):
+        for reconcile in self:
+            dates = reconcile.reconciled_line_ids.mapped('date')
+            reconcile.min_date = min(dates) if dates else False
+            reconcile.max_date = max(dates) if dates else False
+
+    @api.model
+    def create(self, vals):
+        reconcile = super(AccountFullReconcile, self).create(vals)
+        reconcile._invalidate_report_cache()
+        return reconcile
+
+    @api.multi
+    def unlink(self):
+        # the journal items are unmatched in SQL, without write date
+        self._invalidate_report_cache(removed=True)
+        return super(AccountFullReconcile, self).unlink()
+
+    def _invalidate_report_cache(self, removed=False):
+        lines = self.mapped('reconciled_line_ids')
+        if lines:
+            self.env['account.report.standard.ledger.report']._invalidate_cache(
+                lines.mapped('company_id'), lines.mapped('journal_id'), min(lines.mapped('date')), removed=removed)
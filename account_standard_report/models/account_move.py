@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, models
+from odoo.tools.sql import create_index
+
+
+class AccountMove(models.Model):
+    _inherit = 'account.move'
+
+    @api.model_cr
+    def init(self):
+        # the refresh of a report reads the moves posted since its computation
+        create_index(self.env.cr, 'account_move_write_date_index', self._table, ['write_date'])
+
+    @api.multi
+    def post(self, invoice=False):
+        # posting again a posted move does not change the balances
+        to_post = self.filtered(lambda m: m.state != 'posted')
+        res = super(AccountMove, self).post(invoice=invoice)
+        self.env['account.report.balance.snapshot']._apply_moves(to_post, 1)
+        to_post._invalidate_report_cache()
+        return res
+
+    @api.multi
+    def button_cancel(self):
+        posted = self.filtered(lambda m: m.state == 'posted')
+        res = super(AccountMove, self).button_cancel()
+        self.env['account.report.balance.snapshot']._apply_moves(posted, -1)
+        # the moves are cancelled in SQL, without write date
+        posted._invalidate_report_cache(removed=True)
+        return res
+
+    def _invalidate_report_cache(self, removed=False):
+        if self:
+            self.env['account.report.standard.ledger.report']._invalidate_cache(
+                self.mapped('company_id'), self.mapped('journal_id'), min(self.mapped('date')), removed=removed)
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, models
+from odoo.tools.sql import create_index
+
+
+class AccountMoveLine(models.Model):
+    _inherit = 'account.move.line'
+
+    @api.model_cr
+    def init(self):
+        # every stage of the standard report reads the journal items of a
+        # company by account and date
+        create_index(self.env.cr, 'account_move_line_company_account_date_index', self._table,
+                     ['company_id', 'account_id', 'date'])
+        # the refresh of a report reads the journal items written since its
+        # computation
+        create_index(self.env.cr, 'account_move_line_company_write_date_index', self._table,
+                     ['company_id', 'write_date'])
+
+    @api.multi
+    def write(self, vals):
+        # the previous partner or analytic account of the posted journal
+        # items are not known by the refresh of the reports
+        moved = self.browse()
+        if 'partner_id' in vals or 'analytic_account_id' in vals:
+            moved = self.filtered(lambda line: line.move_id.state == 'posted')
+        # the balance snapshots are summed by partner
+        snapshot_lines = moved if 'partner_id' in vals else self.browse()
+        self.env['account.report.balance.snapshot']._apply_lines(snapshot_lines, -1)
+        res = super(AccountMoveLine, self).write(vals)
+        self.env['account.report.balance.snapshot']._apply_lines(snapshot_lines, 1)
+        if moved:
+            self.env['account.report.standard.ledger.report']._invalidate_cache(
+                moved.mapped('company_id'), moved.mapped('journal_id'), min(moved.mapped('date')), removed=True)
+        return res
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+import base64
+import logging
+import time
+
+from datetime import timedelta
+
+from odoo import api, models, fields, tools, _
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+REPORT_ACTIONS = {'pdf': 'account_standard_report.action_standard_report',
+                  'xlsx': 'account_standard_report.action_standard_excel',
+                  }
+
+STAGE_NAMES = {'_sql_report_object': _('Objects of the report'),
+               '_sql_unaffected_earnings': _('Unaffected earnings'),
+               '_sql_init_balance': _('Initial balances'),
+               '_sql_lines': _('Lines'),
+               '_sql_lines_compacted': _('Compacted lines'),
+               '_sql_total': _('Totals'),
+               '_sql_summary_total': _('Totals'),
+               '_sql_super_total': _('Grand total'),
+               }
+
+# default minutes without progress after which a running job is failed,
+# its worker being killed or out of time, see the
+# account_standard_report.job_timeout system parameter
+JOB_TIMEOUT = 120
+
+
+class AccountStandardLedgerJob(models.Model):
+    _name = 'account.report.standard.ledger.job'
+    _inherit = ['mail.thread']
+    _order = 'id desc'
+    _description = 'Account Standard Ledger Job'
+
+    name = fields.Char(required=True, readonly=True)
+    wizard_id = fields.Integer('Options', readonly=True, help='Wizard holding the options of the report.')
+    report_format = fields.Selection([('pdf', 'PDF'), ('xlsx', 'Excel')], string='Format', required=True, readonly=True)
+    state = fields.Selection([('queued', 'Queued'),
+                              ('running', 'Running'),
+                              ('done', 'Done'),
+                              ('failed', 'Failed'),
+                              ], default='queued', required=True, readonly=True, track_visibility='onchange')
+    stage = fields.Char(readonly=True)
+    progress = fields.Float(readonly=True)
+    date_start = fields.Datetime('Start Date', readonly=True)
+    date_end = fields.Datetime('End Date', readonly=True)
+    date_progress = fields.Datetime('Last Progress', readonly=True,
+                                    help='Last time the running job reported its progress.')
+    attachment_id = fields.Many2one('ir.attachment', 'Report', readonly=True, ondelete='set null')
+    datas = fields.Binary('File', related='attachment_id.datas', readonly=True)
+    datas_fname = fields.Char('File Name', related='attachment_id.datas_fname', readonly=True)
+    error = fields.Text(readonly=True)
+    company_id = fields.Many2one('res.company', string='Company', readonly=True,
+                                 default=lambda self: self.env.user.company_id)
+
+    def _set_progress(self, vals):
+        """ Write `vals` in a separate transaction, visible while the report
+        is computed, with the time as heartbeat of the job. """
+        with self.pool.cursor() as cr:
+            self.with_env(self.env(cr=cr)).write(dict(vals, date_progress=fields.Datetime.now()))
+
+    @api.multi
+    def _generate(self):
+        """ Compute and render the report as its requester, return the
+        attachment holding the file. """
+        self.ensure_one()
+        user = self.create_uid
+        wizard = self.env['account.report.standard.ledger'].sudo(user).with_context(
+            lang=user.lang, tz=user.tz).browse(self.wizard_id).exists()
+        if not wizard:
+            raise UserError(_('The options of the report have been deleted, please generate it again.'))
+        self._set_progress({'state': 'running', 'date_start': fields.Datetime.now(), 'progress': 0.0})
+
+        def progress(stage, index, count):
+            self._set_progress({'stage': STAGE_NAMES.get(stage, stage), 'progress': 90.0 * index / count})
+
+        # committed by the cron after the job, the lines may be computed in
+        # parallel transactions
+        wizard.with_context(standard_report_parallel=True)._compute_data(progress=progress)
+        self._set_progress({'stage': _('Rendering'), 'progress': 90.0})
+        action = self.env.ref(REPORT_ACTIONS[self.report_format]).sudo(user).with_context(wizard.env.context)
+        start = time.time()
+        content = action.render(wizard.ids)[0]
+        if self.report_format == 'pdf':
+            wizard.report_id._add_stat('pdf', time.time() - start)
+        file_name = '%s.%s' % (wizard.report_id.report_name, self.report_format)
+        return self.env['ir.attachment'].create({
+            'name': file_name,
+            'datas_fname': file_name,
+            'datas': base64.b64encode(content),
+            'res_model': 'account.report.standard.ledger.report',
+            'res_id': wizard.report_id.id,
+        })
+
+    @api.model
+    def _cron_process(self):
+        """ Generate the queued reports, each in its own transaction. """
+        self._fail_stalled()
+        for job in self.search([('state', '=', 'queued')], order='id'):
+            try:
+                attachment = job._generate()
+                # the job was updated by _set_progress in other transactions,
+                # commit the report before writing it
+                self.env.cr.commit()
+                self.invalidate_cache()
+                job.write({'state': 'done', 'date_end': fields.Datetime.now(), 'stage': False,
+                           'progress': 100.0, 'attachment_id': attachment.id})
+                job.message_post(body=_('The report %s is ready.') % job.name,
+                                 attachment_ids=attachment.ids, subtype='mail.mt_comment')
+            except Exception as e:
+                self.env.cr.rollback()
+                self.invalidate_cache()
+                _logger.exception('Standard report job %s failed.', job.id)
+                job.write({'state': 'failed', 'date_end': fields.Datetime.now(), 'error': tools.ustr(e)})
+                job.message_post(body=_('The report %s failed.') % job.name, subtype='mail.mt_comment')
+            self.env.cr.commit()
+
+    @api.model
+    def _fail_stalled(self):
+        """ Fail the running jobs without progress for longer than the
+        timeout: their worker was killed or ran out of time. The cron runs
+        one job at a time, so none of them is still being generated. """
+        timeout = int(self.env['ir.config_parameter'].sudo().get_param(
+            'account_standard_report.job_timeout', JOB_TIMEOUT))
+        limit = fields.Datetime.now() - timedelta(minutes=timeout)
+        jobs = self.search([('state', '=', 'running'), '|', ('date_progress', '<', limit),
+                            '&', ('date_progress', '=', False), ('write_date', '<', limit)])
+        for job in jobs:
+            _logger.warning('Standard report job %s stalled, marked as failed.', job.id)
+            job.write({'state': 'failed', 'date_end': fields.Datetime.now(),
+                       'error': _('The generation stopped without error after %s minutes without progress, '
+                                  'please generate the report again.') % timeout})
+            job.message_post(body=_('The report %s failed.') % job.name, subtype='mail.mt_comment')
+        self.env.cr.commit()
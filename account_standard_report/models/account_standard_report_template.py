@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 from odoo import api, models, fields, _
+from odoo.exceptions import ValidationError
 
 
 class AccountStandardLedger(models.Model):
@@ -62,6 +63,22 @@ class AccountStandardLedger(models.Model):
                                          ], string="Partners Selection", required=True, default='supplier')
     report_name = fields.Char('Report Name')
     compact_account = fields.Boolean('Compacte account.', default=False)
+    aged_period_length = fields.Integer('Period Length (days)', default=30,
+                                        help='Number of days of each column of the Aged Balance.')
+    excel_layout = fields.Selection([('both', 'Grouped and flat sheets'),
+                                     ('grouped', 'Sheet grouped by object'),
+                                     ('flat', 'Flat sheet'),
+                                     ('outline', 'Flat sheet outlined by object'),
+                                     ], string='Excel Layout', default='both', required=True,
+                                    help='Sheets of the detail Excel report:\n'
+                                    ' * Grouped and flat sheets : every line is written twice.\n'
+                                    ' * Flat sheet outlined by object : one sheet with the lines of each object in an outline level.\n')
+
+    @api.constrains('aged_period_length')
+    def _check_aged_period_length(self):
+        for record in self:
+            if record.aged_period_length <= 0:
+                raise ValidationError(_('The period length of the Aged Balance must be greater than 0.'))
 
     @api.onchange('account_in_ex_clude_ids')
     def _onchange_account_in_ex_clude_ids(self):
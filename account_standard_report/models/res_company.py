@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields
+
+
+class ResCompany(models.Model):
+    _inherit = 'res.company'
+
+    balance_snapshot_date = fields.Datetime(
+        'Balance Snapshot Date', readonly=True, copy=False,
+        help='Last full rebuild of the balance snapshots used by the Standard Report to compute initial balances. '
+        'If empty, initial balances are computed from all the entries.')
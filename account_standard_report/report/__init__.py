@@ -1,3 +1,4 @@
 # -*- coding: utf-8 -*-
 
 from . import report_account_standard_excel
+from . import report_account_standard_report
@@ -1,24 +1,57 @@
 # -*- coding: utf-8 -*-
+import time
+
 from datetime import datetime
+from itertools import chain, groupby
+from operator import attrgetter
+
 from odoo.tools import DEFAULT_SERVER_DATE_FORMAT
 from odoo import models, _
 
+from xlsxwriter.utility import xl_range
+
 
 class StandardReportXlsx(models.AbstractModel):
     _name = 'report.account_standard_report.report_account_standard_excel'
     _inherit = 'report.report_xlsx.abstract'
 
+    def get_workbook_options(self):
+        # rows are written in order, so each one can be flushed to disk
+        # as soon as the next one starts
+        return {'constant_memory': True}
+
+    def create_xlsx_report(self, docids, data):
+        start = time.time()
+        res = super(StandardReportXlsx, self).create_xlsx_report(docids, data)
+        for wizard in self.env['account.report.standard.ledger'].browse(docids):
+            wizard.report_id._add_stat('xlsx', time.time() - start)
+        return res
+
+    def _get_format_registry(self, workbook):
+        """ Return a function giving the format of the given properties,
+        added to the workbook once for all the sheets. """
+        formats = {}
+
+        def get_format(**properties):
+            key = tuple(sorted(properties.items()))
+            if key not in formats:
+                formats[key] = workbook.add_format(properties)
+            return formats[key]
+        return get_format
+
     def generate_xlsx_report(self, workbook, data, wizard):
 
+        get_format = self._get_format_registry(workbook)
         num_format = wizard.company_currency_id.excel_format
-        bold = workbook.add_format({'bold': True})
-        middle = workbook.add_format({'bold': True, 'top': 1})
-        left = workbook.add_format({'left': 1, 'top': 1, 'bold': True})
-        right = workbook.add_format({'right': 1, 'top': 1})
-        top = workbook.add_format({'top': 1})
-        currency_format = workbook.add_format({'num_format': num_format})
-        c_middle = workbook.add_format({'bold': True, 'top': 1, 'num_format': num_format})
-        report_format = workbook.add_format({'font_size': 24})
+        bold = get_format(bold=True)
+        middle = get_format(bold=True, top=1)
+        left = get_format(left=1, top=1, bold=True)
+        right = get_format(right=1, top=1)
+        top = get_format(top=1)
+        currency_format = get_format(num_format=num_format)
+        c_middle = get_format(bold=True, top=1, num_format=num_format)
+        head_format = get_format(bold=True, bottom=1)
+        report_format = get_format(font_size=24)
         rounding = self.env.user.company_id.currency_id.decimal_places or 2
         lang_code = self.env.user.lang or 'en_US'
         date_format = self.env['res.lang']._lang_get(lang_code).date_format
@@ -38,20 +71,139 @@ class StandardReportXlsx(models.AbstractModel):
             return date
 
         def _header_sheet(sheet):
+            # constant_memory mode: cells must be written row by row
             sheet.write(0, 4, report.name, report_format)
-            sheet.write(2, 0, _('Company:'), bold)
-            sheet.write(3, 0, wizard.company_id.name,)
-            sheet.write(4, 0, _('Print on %s') % report.print_time)
 
+            sheet.write(2, 0, _('Company:'), bold)
             sheet.write(2, 2, _('Start Date : %s ') % wizard.date_from if wizard.date_from else '')
-            sheet.write(3, 2, _('End Date : %s ') % wizard.date_to if wizard.date_to else '')
-
             sheet.write(2, 4, _('Target Moves:'), bold)
+            sheet.write(2, 6, _('Only UnReconciled Entries') if wizard.reconciled is False else _('With Reconciled Entries'), bold)
+
+            sheet.write(3, 0, ', '.join(wizard.report_id.company_ids.mapped('name')) or wizard.company_id.name,)
+            sheet.write(3, 2, _('End Date : %s ') % wizard.date_to if wizard.date_to else '')
             sheet.write(3, 4, _('All Entries') if wizard.target_move == 'all' else _('All Posted Entries'))
 
-            sheet.write(2, 6, _('Only UnReconciled Entries') if wizard.reconciled is False else _('With Reconciled Entries'), bold)
+            sheet.write(4, 0, _('Print on %s') % report.print_time)
+
+        def _set_columns(sheet, head):
+            for j, h in enumerate(head):
+                sheet.set_column(j, j, h['larg'])
+
+        def _set_head(sheet, row, head):
+            for j, h in enumerate(head):
+                sheet.write(row, j, h['name'], head_format)
+
+        def _new_totals(head):
+            return {j: 0.0 for j, h in enumerate(head) if h['col'].get('total_function') == 'sum'}
+
+        def _set_row(sheet, row, values, totals):
+            for col, (value, cell_format) in enumerate(values):
+                if value is None:
+                    continue
+                sheet.write(row, col, value, cell_format)
+                if col in totals:
+                    totals[col] += value or 0.0
+
+        def _set_total(sheet, row, head, start_row, totals):
+            # tables are not available in constant_memory mode, the total
+            # row is written by hand with the sum already computed
+            for j, h in enumerate(head):
+                if j in totals:
+                    formula = '=SUBTOTAL(109,%s)' % xl_range(start_row, j, row - 1, j)
+                    sheet.write_formula(row, j, formula, c_middle, totals[j])
+                else:
+                    sheet.write(row, j, '', middle)
+
+        def _set_table(sheet, start_row, head, lines, line_values):
+            """ Write head, lines and total of a single table. """
+            _set_columns(sheet, head)
+            _set_head(sheet, start_row - 1, head)
+            totals = _new_totals(head)
+            row = start_row
+            for line in lines:
+                _set_row(sheet, row, line_values(line), totals)
+                row += 1
+            if row > start_row:
+                _set_total(sheet, row, head, start_row, totals)
+                sheet.autofilter(start_row - 1, 0, row - 1, len(head) - 1)
+
+        def _set_detail(head, line_values, title_formats, type_l):
+            """ Stream the detail lines once, ordered by report object, into
+            the sheets of the Excel layout of the wizard: grouped by object,
+            flat, both at the same time, or outlined by object in one sheet.
+            """
+            layout = wizard.excel_layout or 'both'
+            outline = layout == 'outline'
+            sheet = flat_sheet = None
+            if layout in ('grouped', 'both'):
+                sheet = workbook.add_worksheet(report.name + _(' Totals'))
+                _header_sheet(sheet)
+                _set_columns(sheet, head)
+            if layout in ('flat', 'both', 'outline'):
+                flat_sheet = workbook.add_worksheet(report.name)
+                _header_sheet(flat_sheet)
+                _set_columns(flat_sheet, head)
+
+            all_lines = wizard._sql_iter_line_for_report(type_l=type_l, order_by_object=True)
+
+            row = 6
+            flat_start_row = flat_row = 7
+            flat_totals = _new_totals(head)
+            for dummy, lines_obj in groupby(all_lines, key=attrgetter('report_object_id')):
+                first_line = next(lines_obj)
+                if sheet:
+                    row += 1
+                    sheet.write(row, 0, first_line.object_name or '', title_formats[0])
+                    for j, cell_format in enumerate(title_formats[1:], 1):
+                        sheet.write(row, j, '', cell_format)
+
+                    row += 1
+                    _set_head(sheet, row, head)
+                    row += 1
+                    start_row = row
+                    totals = _new_totals(head)
+
+                if flat_row == flat_start_row and flat_sheet:
+                    _set_head(flat_sheet, flat_start_row - 1, head)
+                if outline:
+                    # the lines of each object are one outline level under
+                    # its title and its subtotal
+                    flat_sheet.write(flat_row, 0, first_line.object_name or '', bold)
+                    flat_row += 1
+                    outline_start_row = flat_row
+                    outline_totals = _new_totals(head)
+
+                for line in chain([first_line], lines_obj):
+                    values = line_values(line)
+                    if sheet:
+                        _set_row(sheet, row, values, totals)
+                        row += 1
+
+                    if outline:
+                        flat_sheet.set_row(flat_row, None, None, {'level': 1})
+                        _set_row(flat_sheet, flat_row, values, outline_totals)
+                        flat_row += 1
+                    elif flat_sheet:
+                        _set_row(flat_sheet, flat_row, values, flat_totals)
+                        flat_row += 1
+
+                if sheet:
+                    _set_total(sheet, row, head, start_row, totals)
+                    row += 1
+                if outline:
+                    _set_total(flat_sheet, flat_row, head, outline_start_row, outline_totals)
+                    flat_row += 1
+                    for col, total in outline_totals.items():
+                        flat_totals[col] += total
+
+            if flat_row > flat_start_row:
+                # SUBTOTAL ignores the subtotals of the outlined objects
+                _set_total(flat_sheet, flat_row, head, flat_start_row, flat_totals)
+                if not outline:
+                    flat_sheet.autofilter(flat_start_row - 1, 0, flat_row - 1, len(head) - 1)
 
         if wizard.ledger_type == 'aged':
+            aged_labels = wizard._get_aged_labels()
 
             if wizard.summary:
                 sheet = workbook.add_worksheet(report.name)
@@ -64,22 +216,22 @@ class StandardReportXlsx(models.AbstractModel):
                     {'name': 'Name',
                      'larg': 30,
                      'col': {}},
-                    {'name': _('Not Due'),
+                    {'name': aged_labels[0],
                      'larg': 15,
                      'col': {'total_function': 'sum', 'format': currency_format}},
-                    {'name': _('0-30'),
+                    {'name': aged_labels[1],
                      'larg': 15,
                      'col': {'total_function': 'sum', 'format': currency_format}},
-                    {'name': _('30-60'),
+                    {'name': aged_labels[2],
                      'larg': 15,
                      'col': {'total_function': 'sum', 'format': currency_format}},
-                    {'name': _('60-90'),
+                    {'name': aged_labels[3],
                      'larg': 15,
                      'col': {'total_function': 'sum', 'format': currency_format}},
-                    {'name': _('90-120'),
+                    {'name': aged_labels[4],
                      'larg': 15,
                      'col': {'total_function': 'sum', 'format': currency_format}},
-                    {'name': _('Older'),
+                    {'name': aged_labels[5],
                      'larg': 15,
                      'col': {'total_function': 'sum', 'format': currency_format}},
                     {'name': _('Total'),
@@ -87,41 +239,21 @@ class StandardReportXlsx(models.AbstractModel):
                      'col': {'total_function': 'sum', 'format': currency_format}},
                 ]
 
-                all_lines = wizard._sql_get_line_for_report(type_l=('4_total',))
-                # print(all_lines)
-                if all_lines:
+                def _line_values(line):
+                    return [
+                        (line.code, None),
+                        (line.name, None),
+                        (_get_data_float(line.current), currency_format),
+                        (_get_data_float(line.age_30_days), currency_format),
+                        (_get_data_float(line.age_60_days), currency_format),
+                        (_get_data_float(line.age_90_days), currency_format),
+                        (_get_data_float(line.age_120_days), currency_format),
+                        (_get_data_float(line.older), currency_format),
+                        (_get_data_float(line.balance), currency_format),
+                    ]
 
-                    row = 6
-                    row += 1
-                    start_row = row
-                    for i, line in enumerate(all_lines):
-                        i += row
-                        sheet.write(i, 0, line.get('code', ''))
-                        sheet.write(i, 1, line.get('name', ''))
-                        sheet.write(i, 2, _get_data_float(line.get('current')), currency_format)
-                        sheet.write(i, 3, _get_data_float(line.get('age_30_days')), currency_format)
-                        sheet.write(i, 4, _get_data_float(line.get('age_60_days')), currency_format)
-                        sheet.write(i, 5, _get_data_float(line.get('age_90_days')), currency_format)
-                        sheet.write(i, 6, _get_data_float(line.get('age_120_days')), currency_format)
-                        sheet.write(i, 7, _get_data_float(line.get('older')), currency_format)
-                        sheet.write(i, 8, _get_data_float(line.get('balance')), currency_format)
-                    row = i
-
-                    for j, h in enumerate(head):
-                        sheet.set_column(j, j, h['larg'])
-
-                    table = []
-                    for h in head:
-                        col = {}
-                        col['header'] = h['name']
-                        col.update(h['col'])
-                        table.append(col)
-
-                    sheet.add_table(start_row - 1, 0, row + 1, len(head) - 1,
-                                    {'total_row': 1,
-                                     'columns': table,
-                                     'style': 'Table Style Light 9',
-                                     })
+                all_lines = wizard._sql_iter_line_for_report(type_l=('4_total',))
+                _set_table(sheet, 7, head, all_lines, _line_values)
 
             else:  # aged not summary
                 head = [
@@ -149,22 +281,22 @@ class StandardReportXlsx(models.AbstractModel):
                     {'name': _('Due Date'),
                      'larg': 10,
                      'col': {}},
-                    {'name': _('Not Due'),
+                    {'name': aged_labels[0],
                      'larg': 15,
                      'col': {'total_function': 'sum', 'format': currency_format}},
-                    {'name': _('0-30'),
+                    {'name': aged_labels[1],
                      'larg': 15,
                      'col': {'total_function': 'sum', 'format': currency_format}},
-                    {'name': _('30-60'),
+                    {'name': aged_labels[2],
                      'larg': 15,
                      'col': {'total_function': 'sum', 'format': currency_format}},
-                    {'name': _('60-90'),
+                    {'name': aged_labels[3],
                      'larg': 15,
                      'col': {'total_function': 'sum', 'format': currency_format}},
-                    {'name': _('90-120'),
+                    {'name': aged_labels[4],
                      'larg': 15,
                      'col': {'total_function': 'sum', 'format': currency_format}},
-                    {'name': _('Older'),
+                    {'name': aged_labels[5],
                      'larg': 15,
                      'col': {'total_function': 'sum', 'format': currency_format}},
                     {'name': _('Total'),
@@ -174,106 +306,29 @@ class StandardReportXlsx(models.AbstractModel):
                      'larg': 10,
                      'col': {}},
                 ]
-                table = []
-                for h in head:
-                    col = {'header': h['name']}
-                    col.update(h['col'])
-                    table.append(col)
-
-                def _set_line(line):
-                    sheet.write(i, 0, get_date_format(line.get('date', '')))
-                    sheet.write(i, 1, line.get('j_code', ''))
-                    sheet.write(i, 2, line.get('a_code', ''))
-                    sheet.write(i, 3, line.get('a_name', ''))
-                    sheet.write(i, 4, line.get('move_name', ''))
-                    sheet.write(i, 5, line.get('displayed_name', ''))
-                    sheet.write(i, 6, line.get('partner_name', ''))
-                    sheet.write(i, 7, get_date_format(line.get('date_maturity', '')))
-                    sheet.write(i, 8, _get_data_float(line.get('current')), currency_format)
-                    sheet.write(i, 9, _get_data_float(line.get('age_30_days')), currency_format)
-                    sheet.write(i, 10, _get_data_float(line.get('age_60_days')), currency_format)
-                    sheet.write(i, 11, _get_data_float(line.get('age_90_days')), currency_format)
-                    sheet.write(i, 12, _get_data_float(line.get('age_120_days')), currency_format)
-                    sheet.write(i, 13, _get_data_float(line.get('older')), currency_format)
-                    sheet.write(i, 14, _get_data_float(line.get('balance')), currency_format)
-                    sheet.write(i, 15, line.get('matching_number', ''))
-
-                def _set_table(start_row, row):
-                    sheet.add_table(start_row - 1, 0, row + 1, len(head) - 1,
-                                    {'total_row': 1,
-                                     'columns': table,
-                                     'style': 'Table Style Light 9',
-                                     })
-                    #sheet.write(row + 1, 10, "=I%s-J%s" % (row + 2, row + 2), currency_format)
-
-                # With total workbook
-                sheet = workbook.add_worksheet(report.name + _(' Totals'))
-                _header_sheet(sheet)
-
-                row = 6
-                all_lines = wizard._sql_get_line_for_report(type_l=('1_init_line', '2_line'))
-                for obj in report.report_object_ids:
-
-                    lines_obj = []
-                    obj_id = obj.id
-                    for line in all_lines:
-                        if line.get('report_object_id') == obj_id:
-                            lines_obj.append(line)
-                    if lines_obj:
-                        row += 1
-                        sheet.write(row, 0, obj.partner_id.name, left)  # obj.partner_id.name
-                        sheet.write(row, 1, '', top)
-                        sheet.write(row, 2, '', top)
-                        sheet.write(row, 3, '', top)
-                        sheet.write(row, 4, '', top)
-                        sheet.write(row, 5, '', top)
-                        sheet.write(row, 6, '', c_middle)
-                        sheet.write(row, 7, '', c_middle)
-                        sheet.write(row, 8, '', c_middle)
-                        sheet.write(row, 9, '', c_middle)
-                        sheet.write(row, 10, '', c_middle)
-                        sheet.write(row, 11, '', c_middle)
-                        sheet.write(row, 12, '', c_middle)
-                        sheet.write(row, 13, '', c_middle)
-                        sheet.write(row, 14, '', c_middle)
-                        sheet.write(row, 15, '', right)
-
-                        row += 2
-                        start_row = row
-                        for i, line in enumerate(lines_obj):
-                            i += row
-                            _set_line(line)
-
-                        row = i
-
-                        for j, h in enumerate(head):
-                            sheet.set_column(j, j, h['larg'])
-
-                        _set_table(start_row, row)
-                        row += 2
-
-                # Pivot
-                sheet = workbook.add_worksheet(report.name)
-                _header_sheet(sheet)
-
-                # for group_by in data['group_by_data']['ids']:
-                #     for line in data['lines_group_by'][group_by]['new_lines']:
-                #         if line['type_line'] != 'total':
-                #             all_lines.append(line)
-                # Head
-                if all_lines:
-                    row = 6
-                    row += 1
-                    start_row = row
-                    for i, line in enumerate(all_lines):
-                        i += row
-                        _set_line(line)
-                    row = i
 
-                    for j, h in enumerate(head):
-                        sheet.set_column(j, j, h['larg'])
+                def _line_values(line):
+                    return [
+                        (get_date_format(line.date), None),
+                        (line.j_code, None),
+                        (line.a_code, None),
+                        (line.a_name, None),
+                        (line.move_name, None),
+                        (line.displayed_name, None),
+                        (line.partner_name, None),
+                        (get_date_format(line.date_maturity), None),
+                        (_get_data_float(line.current), currency_format),
+                        (_get_data_float(line.age_30_days), currency_format),
+                        (_get_data_float(line.age_60_days), currency_format),
+                        (_get_data_float(line.age_90_days), currency_format),
+                        (_get_data_float(line.age_120_days), currency_format),
+                        (_get_data_float(line.older), currency_format),
+                        (_get_data_float(line.balance), currency_format),
+                        (line.matching_number, None),
+                    ]
 
-                    _set_table(start_row, row)
+                title_formats = [left] + [top] * 5 + [c_middle] * 9 + [right]
+                _set_detail(head, _line_values, title_formats, ('1_init_line', '2_line'))
 
         else:  # standard report
 
@@ -281,56 +336,36 @@ class StandardReportXlsx(models.AbstractModel):
                 sheet = workbook.add_worksheet(report.name)
                 _header_sheet(sheet)
 
-                all_lines = wizard._sql_get_line_for_report(type_l=('4_total',))
-                # for group_by in data['group_by_data']['ids']:
-                #     all_lines.append(data['lines_group_by'][group_by])
-                if all_lines:
-                    # Head
-                    head = [
-                        {'name': 'Code',
-                         'larg': 10,
-                         'col': {}},
-                        {'name': 'Name',
-                         'larg': 30,
-                         'col': {}},
-                        {'name': 'Debit',
-                         'larg': 15,
-                         'col': {'total_function': 'sum', 'format': currency_format}},
-                        {'name': 'Credit',
-                         'larg': 15,
-                         'col': {'total_function': 'sum', 'format': currency_format}},
-                        {'name': 'Balance',
-                         'larg': 15,
-                         'col': {'total_function': 'sum', 'format': currency_format}},
+                # Head
+                head = [
+                    {'name': 'Code',
+                     'larg': 10,
+                     'col': {}},
+                    {'name': 'Name',
+                     'larg': 30,
+                     'col': {}},
+                    {'name': 'Debit',
+                     'larg': 15,
+                     'col': {'total_function': 'sum', 'format': currency_format}},
+                    {'name': 'Credit',
+                     'larg': 15,
+                     'col': {'total_function': 'sum', 'format': currency_format}},
+                    {'name': 'Balance',
+                     'larg': 15,
+                     'col': {'total_function': 'sum', 'format': currency_format}},
+                ]
+
+                def _line_values(line):
+                    return [
+                        (line.code, None),
+                        (line.name, None),
+                        (line.debit, currency_format),
+                        (line.credit, currency_format),
+                        (line.balance, currency_format),
                     ]
 
-                    row = 6
-                    row += 1
-                    start_row = row
-                    for i, line in enumerate(all_lines):
-                        i += row
-                        sheet.write(i, 0, line.get('code', ''))
-                        sheet.write(i, 1, line.get('name', ''))
-                        sheet.write(i, 2, line.get('debit', ''), currency_format)
-                        sheet.write(i, 3, line.get('credit', ''), currency_format)
-                        sheet.write(i, 4, line.get('balance', ''), currency_format)
-                    row = i
-
-                    for j, h in enumerate(head):
-                        sheet.set_column(j, j, h['larg'])
-
-                    table = []
-                    for h in head:
-                        col = {}
-                        col['header'] = h['name']
-                        col.update(h['col'])
-                        table.append(col)
-
-                    sheet.add_table(start_row - 1, 0, row + 1, len(head) - 1,
-                                    {'total_row': 1,
-                                     'columns': table,
-                                     'style': 'Table Style Light 9',
-                                     })
+                all_lines = wizard._sql_iter_line_for_report(type_l=('4_total',))
+                _set_table(sheet, 7, head, all_lines, _line_values)
 
             else:  # not summary
 
@@ -381,107 +416,51 @@ class StandardReportXlsx(models.AbstractModel):
                      'larg': 10,
                      'col': {}},
                 ]
-                table = []
-                for h in head:
-                    col = {'header': h['name']}
-                    col.update(h['col'])
-                    table.append(col)
-
-                def _set_line(line):
-                    sheet.write(i, 0, get_date_format(line.get('date', '')) if line.get('view_type') != 'init' else 'INIT')
-                    sheet.write(i, 1, line.get('j_code', ''))
-                    sheet.write(i, 2, line.get('a_code', ''))
-                    sheet.write(i, 3, line.get('a_name', ''))
-                    sheet.write(i, 4, "%s - %s" % (line.get('an_code', ''), line.get('an_name', '')) if line.get('an_code', '') else line.get('an_name', ''))
-                    sheet.write(i, 5, line.get('move_name', ''))
-                    sheet.write(i, 6, line.get('displayed_ref', ''))
-                    sheet.write(i, 7, line.get('displayed_name', ''))
-                    sheet.write(i, 8, line.get('partner_name', ''))
-                    sheet.write(i, 9, get_date_format(line.get('date_maturity', '')))
-                    sheet.write(i, 10, _get_data_float(line.get('debit', '')), currency_format)
-                    sheet.write(i, 11, _get_data_float(line.get('credit', '')), currency_format)
-                    sheet.write(i, 12, _get_data_float(line.get('cumul_balance', '')), currency_format)
-                    if line.get('amount_currency', ''):
-                        sheet.write(i, 13, _get_data_float(line.get('amount_currency', '')), workbook.add_format({'num_format': line.get('currency')}))
-                    sheet.write(i, 14, line.get('matching_number', ''))
-
-                def _set_table(start_row, row):
-                    sheet.add_table(start_row - 1, 0, row + 1, len(head) - 1,
-                                    {'total_row': 1,
-                                     'columns': table,
-                                     'style': 'Table Style Light 9',
-                                     })
-
-                # With total workbook
-                sheet = workbook.add_worksheet(report.name + _(' Totals'))
-                _header_sheet(sheet)
-
-                row = 6
 
-                all_lines = wizard._sql_get_line_for_report(type_l=('0_init', '1_init_line', '2_line', '3_compact'))
-                for obj in report.report_object_ids:
-                    lines_obj = []
-                    obj_id = obj.id
-                    for line in all_lines:
-                        if line.get('report_object_id') == obj_id:
-                            lines_obj.append(line)
-                    if lines_obj:
-                        row += 1
-                        name_view = ''
-                        if wizard.report_type == 'account':
-                            name_view = obj.account_id.display_name
-                        if wizard.report_type == 'partner':
-                            name_view = obj.partner_id.display_name
-                        if wizard.report_type == 'journal':
-                            name_view = obj.journal_id.display_name
-                        if wizard.report_type == 'analytic':
-                            name_view = obj.analytic_account_id.display_name
-
-                        sheet.write(row, 0, name_view, left)
-                        sheet.write(row, 1, '', top)
-                        sheet.write(row, 2, '', top)
-                        sheet.write(row, 3, '', top)
-                        sheet.write(row, 4, '', top)
-                        sheet.write(row, 5, '', top)
-                        sheet.write(row, 6, '', top)
-                        sheet.write(row, 7, '', top)
-                        sheet.write(row, 8, '', top)
-                        sheet.write(row, 9, '', top)
-                        sheet.write(row, 10, '', top)
-                        sheet.write(row, 11, '', top)
-                        sheet.write(row, 12, '', top)
-                        sheet.write(row, 13, '', top)
-                        sheet.write(row, 14, '', right)
-
-                        row += 2
-                        start_row = row
-                        for i, line in enumerate(lines_obj):
-                            i += row
-                            _set_line(line)
-
-                        row = i
-
-                        for j, h in enumerate(head):
-                            sheet.set_column(j, j, h['larg'])
-
-                        _set_table(start_row, row)
-                        row += 2
-
-                # Pivot workbook
-                sheet = workbook.add_worksheet(report.name)
-                _header_sheet(sheet)
+                def _line_values(line):
+                    return [
+                        (get_date_format(line.date) if line.view_type != 'init' else 'INIT', None),
+                        (line.j_code, None),
+                        (line.a_code, None),
+                        (line.a_name, None),
+                        ("%s - %s" % (line.an_code, line.an_name) if line.an_code else line.an_name, None),
+                        (line.move_name, None),
+                        (line.displayed_ref, None),
+                        (line.displayed_name, None),
+                        (line.partner_name, None),
+                        (get_date_format(line.date_maturity), None),
+                        (_get_data_float(line.debit), currency_format),
+                        (_get_data_float(line.credit), currency_format),
+                        (_get_data_float(line.cumul_balance), currency_format),
+                        (_get_data_float(line.amount_currency), get_format(num_format=line.currency))
+                        if line.amount_currency else (None, None),
+                        (line.matching_number, None),
+                    ]
 
-                # Head
-                if all_lines:
-                    row = 6
-                    row += 1
-                    start_row = row
-                    for i, line in enumerate(all_lines):
-                        i += row
-                        _set_line(line)
-                    row = i
+                title_formats = [left] + [top] * 13 + [right]
+                _set_detail(head, _line_values, title_formats, ('0_init', '1_init_line', '2_line', '3_compact'))
 
-                    for j, h in enumerate(head):
-                        sheet.set_column(j, j, h['larg'])
+            periods, rows = wizard._get_comparison()
+            if periods:
+                sheet = workbook.add_worksheet(report.name + _(' Periods'))
+                _header_sheet(sheet)
 
-                    _set_table(start_row, row)
+                head = [{'name': _('Account'),
+                         'larg': 40,
+                         'col': {}}]
+                for period in periods:
+                    for name in (_('Debit'), _('Credit'), _('Balance')):
+                        head.append({'name': '%s %s' % (name, period),
+                                     'larg': 15,
+                                     'col': {'total_function': 'sum', 'format': currency_format}})
+
+                def _comparison_values(row):
+                    name, amounts = row
+                    values = [(name, None)]
+                    for debit, credit, balance in amounts:
+                        values += [(_get_data_float(debit), currency_format),
+                                   (_get_data_float(credit), currency_format),
+                                   (_get_data_float(balance), currency_format)]
+                    return values
+
+                _set_table(sheet, 7, head, rows, _comparison_values)
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+import io
+import logging
+import os
+import subprocess
+import tempfile
+
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, groupby
+from operator import attrgetter
+
+from PyPDF2 import PdfFileReader, PdfFileWriter
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+
+from odoo import api, models, tools, _
+from odoo.addons.base.models.ir_actions_report import _get_wkhtmltopdf_bin
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+PDF_REPORT = 'account_standard_report.report_account_standard_report'
+PDF_CHUNK_LINES = 5000
+PDF_WORKERS = 4
+DETAIL_LINE_TYPES = ('0_init', '1_init_line', '2_line', '3_compact', '4_total')
+TOTAL_FIELDS = ('debit', 'credit', 'balance', 'current', 'age_30_days', 'age_60_days', 'age_90_days',
+                'age_120_days', 'older')
+
+# the page numbers of a split report are stamped on the merged document,
+# the ones of each chunk are hidden
+HIDE_PAGE_NUMBERS = b"""<script>
+    window.addEventListener('load', function () {
+        var nodes = document.querySelectorAll('.page, .topage');
+        for (var i = 0; i < nodes.length; i++) {
+            var node = nodes[i];
+            var list = node.parentNode && node.parentNode.parentNode;
+            (list && list.tagName === 'UL' ? list : node).style.visibility = 'hidden';
+        }
+    });
+</script>"""
+
+
+class StandardReportPdf(models.AbstractModel):
+    _name = 'report.account_standard_report.report_account_standard_report'
+    _description = 'Standard Report PDF'
+
+    @api.model
+    def _get_report_values(self, docids, data=None):
+        wizards = self.env['account.report.standard.ledger'].browse(docids)
+        data = data or {}
+        lang = self.env['res.lang']._lang_get(self.env.user.lang or 'en_US')
+        date_format = lang.date_format
+        # the rows are read while rendered, the currencies of their amounts
+        # are not known before
+        currencies = {currency.id: currency for currency in
+                      self.env['res.currency'].with_context(active_test=False).search([])}
+
+        def format_date(date):
+            return date.strftime(date_format) if date else ''
+
+        def format_amount(amount, currency):
+            # same output as the monetary widget, without reading the lines
+            value = lang.format('%.{0}f'.format(currency.decimal_places), currency.round(amount or 0.0) + 0.0,
+                                grouping=True, monetary=True).replace(' ', u'\N{NO-BREAK SPACE}')
+            if currency.position == 'after':
+                return u'%s\N{NO-BREAK SPACE}%s' % (value, currency.symbol or '')
+            return u'%s\N{NO-BREAK SPACE}%s' % (currency.symbol or '', value)
+
+        reports = {}
+        for wizard in wizards:
+            # the lines and totals are streamed to the template while it
+            # renders them, which iterates each of them once
+            if wizard.summary:
+                objects = []
+                totals = wizard._sql_iter_line_for_report(type_l=('4_total',))
+            else:
+                lines = wizard._sql_iter_line_for_report(type_l=DETAIL_LINE_TYPES,
+                                                         report_object=data.get('report_object_ids'),
+                                                         order_by_object=True)
+                objects = _iter_objects(lines)
+                totals = []
+            super_total = next(wizard._sql_iter_line_for_report(type_l=('5_super_total',)), None)
+            reports[wizard.id] = {
+                'objects': objects,
+                'totals': totals,
+                'super_total': super_total,
+                'aged_labels': wizard._get_aged_labels(),
+                'company_currency': wizard.company_currency_id,
+                'first': not data.get('chunk'),
+                'carried_from': data.get('carried_from'),
+                'carried_to': data.get('carried_to'),
+                # after the last lines
+                'comparison': wizard._get_comparison() if not data.get('carried_to') else ([], []),
+            }
+
+        return {
+            'doc_ids': docids,
+            'doc_model': 'account.report.standard.ledger',
+            'docs': wizards,
+            'reports': reports,
+            'currencies': currencies,
+            'format_date': format_date,
+            'format_amount': format_amount,
+        }
+
+    @api.model
+    def _get_pdf_chunks(self, wizard):
+        """ Split the detail of the report in chunks of whole report objects,
+        of about `account_standard_report.pdf_chunk_lines` lines, with the
+        totals carried from the previous chunks and to the next ones. """
+        chunk_lines = int(self.env['ir.config_parameter'].sudo().get_param(
+            'account_standard_report.pdf_chunk_lines', PDF_CHUNK_LINES))
+        if wizard.summary or chunk_lines <= 0:
+            return [{}]
+        query = """SELECT
+                raml.report_object_id,
+                COUNT(*),
+                {sums}
+            FROM
+                account_report_standard_ledger_line raml
+                INNER JOIN account_report_standard_ledger_report_object ro ON (ro.id = raml.report_object_id)
+            WHERE
+                raml.report_id = %s
+                AND raml.line_type IN %s
+            GROUP BY
+                raml.report_object_id, ro.name
+            ORDER BY
+                ro.name, raml.report_object_id
+            """.format(sums=', '.join("SUM(CASE WHEN raml.line_type = '4_total' THEN raml.%s END)" % field
+                                      for field in TOTAL_FIELDS))
+        self.env.cr.execute(query, (wizard.report_id.id, DETAIL_LINE_TYPES))
+
+        chunks = []
+        carried = dict.fromkeys(TOTAL_FIELDS, 0.0)
+        chunk = None
+        for row in self.env.cr.fetchall():
+            if chunk is None or chunk['lines'] + row[1] > chunk_lines:
+                chunk = {'chunk': len(chunks), 'report_object_ids': [], 'lines': 0,
+                         'carried_from': dict(carried) if chunks else None}
+                chunks.append(chunk)
+            chunk['report_object_ids'].append(row[0])
+            chunk['lines'] += row[1]
+            for field, value in zip(TOTAL_FIELDS, row[2:]):
+                carried[field] += value or 0.0
+            chunk['carried_to'] = dict(carried)
+        if not chunks:
+            return [{}]
+        chunks[-1]['carried_to'] = None
+        return chunks
+
+
+class IrActionsReport(models.Model):
+    _inherit = 'ir.actions.report'
+
+    @api.multi
+    def render_qweb_pdf(self, res_ids=None, data=None):
+        if self.report_name == PDF_REPORT and res_ids and len(res_ids) == 1 and not data \
+                and not tools.config['test_enable'] and self.get_wkhtmltopdf_state() in ('ok', 'upgrade'):
+            wizard = self.env['account.report.standard.ledger'].browse(res_ids)
+            chunks = self.env['report.%s' % PDF_REPORT]._get_pdf_chunks(wizard)
+            if len(chunks) > 1:
+                return self._render_split_pdf(res_ids, chunks), 'pdf'
+        return super(IrActionsReport, self).render_qweb_pdf(res_ids=res_ids, data=data)
+
+    @api.multi
+    def _render_split_pdf(self, res_ids, chunks):
+        """ Render the HTML of each chunk, convert the chunks to PDF in
+        parallel wkhtmltopdf processes, then merge them with continuous page
+        numbers. """
+        self = self.with_context(debug=False)
+        paperformat = self.get_paperformat()
+        workers = int(self.env['ir.config_parameter'].sudo().get_param(
+            'account_standard_report.pdf_workers', PDF_WORKERS))
+        temporary_files = []
+        commands = []
+        try:
+            for data in chunks:
+                html = self.render_qweb_html(res_ids, data=data)[0]
+                bodies, dummy, header, footer, specific_paperformat_args = self._prepare_html(html.decode('utf-8'))
+                args = self._build_wkhtmltopdf_args(
+                    paperformat, self.env.context.get('landscape'),
+                    specific_paperformat_args=specific_paperformat_args,
+                    set_viewport_size=self.env.context.get('set_viewport_size'))
+                for option, content in (('--header-html', header), ('--footer-html', footer)):
+                    if content:
+                        content = content.replace(b'</body>', HIDE_PAGE_NUMBERS + b'</body>')
+                        args += [option, _write_temporary_file(content, '.html', temporary_files)]
+                paths = [_write_temporary_file(body, '.html', temporary_files) for body in bodies]
+                commands.append([_get_wkhtmltopdf_bin()] + args + paths +
+                                [_write_temporary_file(b'', '.pdf', temporary_files)])
+            _logger.info('Rendering the standard report in %s chunks', len(commands))
+            with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+                contents = list(executor.map(_run_wkhtmltopdf, commands))
+        finally:
+            for path in temporary_files:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    _logger.error('Error when trying to remove file %s', path)
+        return _merge_pdf(contents, paperformat)
+
+
+def _iter_objects(lines):
+    """ Yield the name of each report object of `lines`, grouped by
+    object, and an iterator on its lines, to be consumed before the next
+    object. """
+    for dummy, group in groupby(lines, key=attrgetter('report_object_id')):
+        first = next(group)
+        yield first.object_name, chain([first], group)
+
+
+def _write_temporary_file(content, suffix, temporary_files):
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix='report.standard.tmp.')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(content)
+    temporary_files.append(path)
+    return path
+
+
+def _run_wkhtmltopdf(command):
+    """ Run in a thread: no access to the database. """
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = process.communicate()
+    if process.returncode not in [0, 1]:
+        raise UserError(_('Wkhtmltopdf failed (error code: %s). Message: %s') % (process.returncode, err[-1000:]))
+    with open(command[-1], 'rb') as pdf_document:
+        return pdf_document.read()
+
+
+def _merge_pdf(contents, paperformat):
+    """ Concatenate the PDF of the chunks and stamp the page numbers in the
+    bottom margin. """
+    readers = [PdfFileReader(io.BytesIO(content), strict=False) for content in contents]
+    total = sum(reader.getNumPages() for reader in readers)
+    writer = PdfFileWriter()
+    number = 0
+    for reader in readers:
+        for i in range(reader.getNumPages()):
+            number += 1
+            page = reader.getPage(i)
+            width, height = float(page.mediaBox.getWidth()), float(page.mediaBox.getHeight())
+            stamp = io.BytesIO()
+            pdf = canvas.Canvas(stamp, pagesize=(width, height))
+            pdf.setFont('Helvetica', 8)
+            pdf.drawRightString(width - (paperformat.margin_right or 5) * mm, (paperformat.margin_bottom or 10) * mm / 2,
+                                '%s / %s' % (number, total))
+            pdf.save()
+            page.mergePage(PdfFileReader(stamp).getPage(0))
+            writer.addPage(page)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
@@ -1,12 +1,34 @@
 # -*- coding: utf-8 -*-
 
 import calendar
+import hashlib
+import json
+import logging
+import tempfile
+import time
+import uuid
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from itertools import groupby
+from psycopg2.extras import NamedTupleCursor
 
 import odoo.addons.decimal_precision as dp
 from datetime import datetime, timedelta
 from odoo import api, models, fields, _
-from odoo.tools import DEFAULT_SERVER_DATE_FORMAT, DEFAULT_SERVER_DATETIME_FORMAT
-from odoo.exceptions import AccessError, UserError
+from odoo.tools import config, DEFAULT_SERVER_DATE_FORMAT, DEFAULT_SERVER_DATETIME_FORMAT
+from odoo.tools.sql import create_index
+from odoo.exceptions import AccessError, UserError, ValidationError
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow
+    import pyarrow.csv
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+    _logger.debug('Can not import pyarrow, the Parquet export is not available.')
 
 D_LEDGER = {'general': {'name': _('General Ledger'),
                         'group_by': 'account_id',
@@ -44,7 +66,47 @@ D_LEDGER = {'general': {'name': _('General Ledger'),
 
 FIELDS_TEMPLATE = ['name', 'ledger_type', 'summary', 'amount_currency', 'reconciled', 'partner_select_ids',
                    'account_methode', 'account_in_ex_clude_ids', 'analytic_account_select_ids', 'init_balance_history',
-                   'journal_ids', 'date_from', 'date_to', 'target_move', 'result_selection', 'compact_account', ]
+                   'journal_ids', 'date_from', 'date_to', 'target_move', 'result_selection', 'compact_account',
+                   'aged_period_length', 'excel_layout', ]
+
+# default number of report lines fetched per round trip when streaming them,
+# see the account_standard_report.stream_batch_size system parameter
+STREAM_BATCH_SIZE = 2000
+
+# default eviction of the computed reports kept for reuse, see the
+# account_standard_report.cache_max_age (minutes) and
+# account_standard_report.cache_max_count system parameters
+CACHE_MAX_AGE = 60
+CACHE_MAX_COUNT = 50
+
+# default hours since their last computation, refresh or reuse after which
+# the reports are deleted by the cleaning scheduled action, see the
+# account_standard_report.retention_hours system parameter: longer than
+# the interval of the reports refreshed every hour
+RETENTION_HOURS = 2.0
+# default number of lines deleted by the cleaning from which the tables of
+# the lines are vacuumed at once, see the
+# account_standard_report.vacuum_min_rows system parameter
+VACUUM_MIN_ROWS = 100000
+
+# default number of transactions computing at once the lines of a report
+# generated in background, see the account_standard_report.parallel_workers
+# system parameter, 1 to compute them in one transaction
+PARALLEL_WORKERS = 1
+# each worker computes several ranges of report objects, so that a range
+# with more lines than the others does not delay the whole report
+PARALLEL_RANGES = 4
+# stages computing each report object independently of the others
+PARALLEL_STAGES = ('_sql_init_balance', '_sql_lines', '_sql_lines_compacted', '_sql_summary_total')
+
+# columns of a comparison of periods, each one an aggregate of the scan of
+# the entries
+MAX_COMPARISON_PERIODS = 60
+
+# columns of the lines of an object of a lazy report read from its total
+# line, when the lines are grouped by object
+LAZY_TOTAL_FIELDS = ('debit', 'credit', 'balance', 'cumul_balance', 'current', 'age_30_days', 'age_60_days',
+                     'age_90_days', 'age_120_days', 'older')
 
 
 class AccountStandardLedgerPeriode(models.TransientModel):
@@ -59,16 +121,155 @@ class AccountStandardLedgerPeriode(models.TransientModel):
 class AccountStandardLedgerReport(models.TransientModel):
     _name = 'account.report.standard.ledger.report'
     _description = 'Account Standard Ledger Report'
+    # deleted with their report after the retention, see _cron_clean
+    _transient_max_hours = 0
+    _transient_max_count = 0
 
     name = fields.Char()
     report_object_ids = fields.One2many('account.report.standard.ledger.report.object', 'report_id')
     report_name = fields.Char()
-    line_total_ids = fields.Many2many('account.report.standard.ledger.line',
-                                      relation='table_standard_report_line_total')
-    line_super_total_id = fields.Many2one('account.report.standard.ledger.line')
+    # not stored: no logged table may reference the lines, see the init of
+    # account.report.standard.ledger.line
+    line_total_ids = fields.Many2many('account.report.standard.ledger.line', compute='_compute_line_total')
+    line_super_total_id = fields.Many2one('account.report.standard.ledger.line', compute='_compute_line_total')
     print_time = fields.Char()
     date_from = fields.Date(string='Start Date', help='Use to compute initial balance.')
     date_to = fields.Date(string='End Date', help='Use to compute the entrie matched with futur.')
+    date_max = fields.Date(string='Last Date', help='End date of the report or of its last compared period: '
+                           'the entries posted until this date invalidate the report.')
+    company_id = fields.Many2one('res.company', string='Company')
+    company_ids = fields.Many2many('res.company', relation='table_standard_report_report_company', string='Companies')
+    journal_ids = fields.Many2many('account.journal', relation='table_standard_report_report_journal')
+    cache_key = fields.Char(index=True, copy=False,
+                            help='Hash of the parameters of the report, empty once it can not be reused.')
+    stat_ids = fields.One2many('account.report.standard.ledger.stat', 'report_id', string='Statistics')
+    comparison_ids = fields.One2many('account.report.standard.ledger.comparison', 'report_id', string='Comparison')
+    use_date = fields.Datetime(default=fields.Datetime.now, help='Last computation, refresh or reuse of the report, '
+                               'from which its retention runs.')
+    refresh_date = fields.Datetime(help='High-water mark of the entries of the report: the entries written since '
+                                   'are applied by its refresh.')
+    refresh_full = fields.Boolean(help='Entries of the report were cancelled or unmatched since its computation, '
+                                  'its refresh recomputes all of it.')
+    lazy = fields.Boolean(help='Only the totals of the report are computed, the lines of each object when '
+                          'displayed, see account.report.standard.ledger.line.search.')
+
+    @api.multi
+    def _compute_line_total(self):
+        line_obj = self.env['account.report.standard.ledger.line']
+        for report in self:
+            report.line_total_ids = line_obj.search([('report_id', '=', report.id), ('line_type', '=', '4_total')])
+            report.line_super_total_id = line_obj.search([('report_id', '=', report.id),
+                                                          ('line_type', '=', '5_super_total')], limit=1)
+
+    @api.model
+    def _get_cached(self, cache_key):
+        """ Return the last report of the user computed with the same
+        parameters, if it is still valid. """
+        get_param = self.env['ir.config_parameter'].sudo().get_param
+        max_age = int(get_param('account_standard_report.cache_max_age', CACHE_MAX_AGE))
+        # the reports are deleted after the retention
+        max_age = min(max_age, int(float(get_param('account_standard_report.retention_hours', RETENTION_HOURS)) * 60) - 1)
+        if max_age <= 0:
+            return self.browse()
+        return self.search([('cache_key', '=', cache_key),
+                            ('create_uid', '=', self.env.uid),
+                            ('use_date', '>=', fields.Datetime.now() - timedelta(minutes=max_age))],
+                           order='id desc', limit=1)
+
+    @api.model
+    def _evict_cache(self):
+        """ Keep only the most recent reports available for reuse. """
+        max_count = int(self.env['ir.config_parameter'].sudo().get_param(
+            'account_standard_report.cache_max_count', CACHE_MAX_COUNT))
+        reports = self.sudo().search([('cache_key', '!=', False)], order='id desc', offset=max_count)
+        reports.write({'cache_key': False})
+
+    @api.model
+    def _invalidate_cache(self, companies, journals, date_from, removed=False):
+        """ Forbid the reuse of the reports that may include entries of
+        `journals` dated from `date_from`. If entries were `removed` from
+        the reports, which leaves no write date to find them, their refresh
+        recomputes them whole. """
+        if not companies:
+            return
+        # the end date for the reports computed before their last date was stored
+        domain = [('company_ids', 'in', companies.ids), '|', ('date_max', '>=', date_from), ('date_to', '>=', date_from)]
+        vals = {'cache_key': False}
+        if removed:
+            vals['refresh_full'] = True
+        else:
+            domain.append(('cache_key', '!=', False))
+        reports = self.sudo().search(domain)
+        reports.filtered(lambda r: r.journal_ids & journals).write(vals)
+
+    def _get_lazy_wizard(self):
+        """ Wizard of the options of the report, which computes its lines
+        on demand. """
+        self.ensure_one()
+        return self.env['account.report.standard.ledger'].search([('report_id', '=', self.id)], order='id', limit=1)
+
+    def _add_stat(self, stage, duration, row_count=0, plan=False):
+        self.ensure_one()
+        self.env['account.report.standard.ledger.stat'].create({
+            'report_id': self.id,
+            'sequence': len(self.stat_ids),
+            'stage': stage,
+            'duration': duration,
+            'row_count': row_count,
+            'plan': plan,
+        })
+
+    @api.model
+    def _cron_clean(self):
+        """ Delete the reports not used for longer than the retention with
+        their lines and objects, then vacuum the tables of the lines if
+        many rows were deleted, instead of waiting for the autovacuum. The
+        lines stay in one table, as the ORM creates and updates it, so they
+        can not be dropped by partition. """
+        get_param = self.env['ir.config_parameter'].sudo().get_param
+        retention = float(get_param('account_standard_report.retention_hours', RETENTION_HOURS))
+        reports = self.sudo().search([('use_date', '<', fields.Datetime.now() - timedelta(hours=retention))])
+        # the reports being rendered in background are kept
+        jobs = self.env['account.report.standard.ledger.job'].sudo().search([('state', '=', 'running')])
+        wizards = self.env['account.report.standard.ledger'].sudo().browse(jobs.mapped('wizard_id')).exists()
+        reports -= wizards.mapped('report_id')
+        if not reports:
+            return
+        self.env.cr.execute("SELECT COUNT(*) FROM account_report_standard_ledger_line WHERE report_id IN %s",
+                            (tuple(reports.ids),))
+        row_count = self.env.cr.fetchone()[0]
+        reports.unlink()
+        self.env.cr.commit()
+        if row_count >= int(get_param('account_standard_report.vacuum_min_rows', VACUUM_MIN_ROWS)):
+            self._vacuum_lines()
+
+    @api.model
+    def _vacuum_lines(self):
+        """ Free the dead rows of the tables of the lines and objects, and
+        update their statistics for the queries by report. """
+        with closing(self.pool.cursor()) as cr:
+            # VACUUM can not run in a transaction
+            cr.autocommit(True)
+            for table in ('account_report_standard_ledger_line', 'account_report_standard_ledger_report_object',
+                          'account_report_standard_ledger_comparison'):
+                cr.execute('VACUUM ANALYZE %s' % table)
+
+
+class AccountStandardLedgerStat(models.TransientModel):
+    _name = 'account.report.standard.ledger.stat'
+    _order = 'report_id, sequence, id'
+    _description = 'Account Standard Ledger Statistic'
+    # deleted with their report after the retention, see _cron_clean
+    _transient_max_hours = 0
+    _transient_max_count = 0
+
+    report_id = fields.Many2one('account.report.standard.ledger.report', ondelete='cascade')
+    sequence = fields.Integer()
+    stage = fields.Char()
+    duration = fields.Float('Time (s)', digits=(16, 3))
+    row_count = fields.Integer('Rows')
+    plan = fields.Text('Query Plan', help='EXPLAIN (ANALYZE, BUFFERS) of the queries of the stage, '
+                       'if the system parameter account_standard_report.explain_analyze is set.')
 
 
 class AccountStandardLedgerLines(models.TransientModel):
@@ -76,8 +277,11 @@ class AccountStandardLedgerLines(models.TransientModel):
     _order = 'id'
     _rec_name = 'move_id'
     _description = 'Account Standard Ledger Line'
+    # deleted with their report after the retention, see _cron_clean
+    _transient_max_hours = 0
+    _transient_max_count = 0
 
-    report_id = fields.Many2one('account.report.standard.ledger.report')
+    report_id = fields.Many2one('account.report.standard.ledger.report', ondelete='cascade')
     account_id = fields.Many2one('account.account', 'Account')
     analytic_account_id = fields.Many2one('account.analytic.account', 'Analytic Account')
     line_type = fields.Selection([('0_init', 'Initial'), ('1_init_line', 'Init Line'),
@@ -110,29 +314,173 @@ class AccountStandardLedgerLines(models.TransientModel):
     currency_id = fields.Many2one('res.currency')
 
     company_currency_id = fields.Many2one('res.currency')
+    line_count = fields.Integer('Lines', help='Number of lines of the report object, on its total line.')
+
+    @api.model_cr
+    def init(self):
+        """ Keep the lines in an UNLOGGED table if the system parameter
+        account_standard_report.unlogged_lines is set: they are neither
+        written in the WAL nor replicated, and are emptied after a crash. """
+        cr = self.env.cr
+        # the totals of the reports were stored in logged tables referencing
+        # the lines, which prevents to unlog them
+        cr.execute("DROP TABLE IF EXISTS table_standard_report_line_total")
+        cr.execute("ALTER TABLE account_report_standard_ledger_report DROP COLUMN IF EXISTS line_super_total_id")
+        unlogged = bool(self.env['ir.config_parameter'].sudo().get_param('account_standard_report.unlogged_lines'))
+        cr.execute("SELECT relpersistence FROM pg_class WHERE relname = %s AND relkind = 'r'", (self._table,))
+        persistence = cr.fetchone()[0]
+        if unlogged and persistence == 'p':
+            cr.execute('ALTER TABLE "%s" SET UNLOGGED' % self._table)
+        elif not unlogged and persistence == 'u':
+            cr.execute('ALTER TABLE "%s" SET LOGGED' % self._table)
+
+        # the stages read the lines of a report by type, then by object
+        create_index(cr, 'account_report_standard_ledger_line_report_type_object_index', self._table,
+                     ['report_id', 'line_type', 'report_object_id'])
+        create_index(cr, 'account_report_standard_ledger_line_object_index', self._table, ['report_object_id'])
+
+    @api.model
+    def search(self, args, offset=0, limit=None, order=None, count=False):
+        """ Insert the lines of a lazy report before searching them: the
+        lines of a report object only until the page searched, in the
+        order of the list, else all the lines of the report. """
+        report, report_object, paged = self._get_lazy_report(args)
+        paged = paged and (not order or order.lower() in ('id', 'id asc'))
+        if report_object and paged and count:
+            return report_object._get_line_count()
+        if report_object:
+            report._get_lazy_wizard()._compute_lazy_lines(report_object, offset + limit if paged and limit else None)
+        elif report:
+            report._get_lazy_wizard()._complete_lazy_report()
+        return super(AccountStandardLedgerLines, self).search(args, offset=offset, limit=limit, order=order, count=count)
 
     @api.model
     def read_group(self, domain, fields, groupby, offset=0, limit=None, orderby=False, lazy=True):
-        res = super(AccountStandardLedgerLines, self).read_group(domain, fields, groupby, offset, limit=limit, orderby=orderby, lazy=lazy)
+        report, report_object, paged = self._get_lazy_report(domain)
+        if report and not report_object and paged and not orderby and groupby in ('report_object_id', ['report_object_id']):
+            # the lines grouped by object of a lazy report: their totals
+            res = self._read_group_lazy_totals(report, domain, fields, offset, limit, lazy)
+        else:
+            if report_object:
+                report._get_lazy_wizard()._compute_lazy_lines(report_object)
+            elif report:
+                report._get_lazy_wizard()._complete_lazy_report()
+            res = super(AccountStandardLedgerLines, self).read_group(domain, fields, groupby, offset, limit=limit, orderby=orderby, lazy=lazy)
         if 'cumul_balance' in fields and 'debit' in fields and 'credit' in fields:
             for line in res:
                 line['cumul_balance'] = line['debit'] - line['credit']
         return res
 
+    @api.model
+    def _get_lazy_report(self, domain):
+        """ Lazy report of the lines searched by `domain`, the report object
+        they are restricted to, and whether the domain only holds the terms
+        of the list of the lines of the report. """
+        report_ids, object_ids, paged = [], [], True
+        for term in domain:
+            if term == '&':
+                continue
+            if not isinstance(term, (list, tuple)) or len(term) != 3:
+                paged = False
+                continue
+            field, operator, value = term
+            types = set(value) if isinstance(value, (list, tuple)) else {value}
+            if field == 'report_id' and operator == '=':
+                report_ids.append(value)
+            elif field == 'report_object_id' and operator == '=':
+                object_ids.append(value)
+            elif field == 'line_type' and operator in ('=', 'in') and types <= {'4_total', '5_super_total'}:
+                # the totals are computed with the report
+                return self.env['account.report.standard.ledger.report'], None, False
+            elif not (field == 'line_type' and operator == 'not in' and types >= {'4_total', '5_super_total'}):
+                paged = False
+        report = self.env['account.report.standard.ledger.report'].browse(report_ids[:1])
+        if len(report_ids) != 1 or not report.exists() or not report.lazy:
+            return report.browse(), None, False
+        report_object = self.env['account.report.standard.ledger.report.object'].browse(object_ids[:1])
+        if len(object_ids) != 1 or report_object.report_id != report:
+            report_object = None
+        return report, report_object, paged
+
+    @api.model
+    def _read_group_lazy_totals(self, report, domain, fields, offset, limit, lazy):
+        """ Groups of the lines of the objects of a lazy report, read from
+        their total lines. """
+        names = [field.split(':')[0] for field in fields]
+        aggregates = [name for name in names if name in LAZY_TOTAL_FIELDS]
+        totals = self.search([('report_id', '=', report.id), ('line_type', '=', '4_total')],
+                             offset=offset, limit=limit, order='report_object_id')
+        groups = []
+        for total in totals.read(['report_object_id', 'line_count'] + aggregates):
+            group = {name: total[name] for name in aggregates}
+            group.update({
+                'report_object_id': total['report_object_id'],
+                'report_object_id_count' if lazy else '__count': total['line_count'],
+                '__domain': list(domain) + [('report_object_id', '=', total['report_object_id'][0])],
+            })
+            groups.append(group)
+        return groups
+
 
 class AccountStandardLedgerReportObject(models.TransientModel):
     _name = 'account.report.standard.ledger.report.object'
     _order = 'name, id'
     _description = 'Account Standard Ledger Object'
+    # deleted with their report after the retention, see _cron_clean
+    _transient_max_hours = 0
+    _transient_max_count = 0
 
     name = fields.Char()
     object_id = fields.Integer()
-    report_id = fields.Many2one('account.report.standard.ledger.report')
+    report_id = fields.Many2one('account.report.standard.ledger.report', ondelete='cascade')
     line_ids = fields.One2many('account.report.standard.ledger.line', 'report_object_id')
     account_id = fields.Many2one('account.account', 'Account')
     journal_id = fields.Many2one('account.journal', 'Journal')
     partner_id = fields.Many2one('res.partner', 'Partner')
     analytic_account_id = fields.Many2one('account.analytic.account', 'Analytic Account')
+    company_id = fields.Many2one('res.company', 'Company', help='Company of the entries of the object, '
+                                 'only in a report consolidating several companies.')
+
+    def _get_line_count(self):
+        """ Number of lines of the object in the detail of its report. """
+        self.ensure_one()
+        self.env.cr.execute("SELECT line_count FROM account_report_standard_ledger_line "
+                            "WHERE report_id = %s AND report_object_id = %s AND line_type = '4_total'",
+                            (self.report_id.id, self.id))
+        row = self.env.cr.fetchone()
+        return row[0] or 0 if row else 0
+
+    @api.model_cr
+    def init(self):
+        # the objects are joined on the report and the id of their record;
+        # the first name of the index was longer than 63 characters, and
+        # truncated by PostgreSQL
+        self.env.cr.execute("DROP INDEX IF EXISTS account_report_standard_ledger_report_object_report_object_inde")
+        create_index(self.env.cr, 'account_report_standard_ledger_report_object_object_index', self._table,
+                     ['report_id', 'object_id'])
+
+
+class AccountStandardLedgerComparison(models.TransientModel):
+    _name = 'account.report.standard.ledger.comparison'
+    _order = 'report_object_id, sequence'
+    _description = 'Account Standard Ledger Comparison'
+    # deleted with their report after the retention, see _cron_clean
+    _transient_max_hours = 0
+    _transient_max_count = 0
+
+    report_id = fields.Many2one('account.report.standard.ledger.report', ondelete='cascade')
+    report_object_id = fields.Many2one('account.report.standard.ledger.report.object', ondelete='cascade')
+    sequence = fields.Integer(help='Rank of the period in the comparison.')
+    name = fields.Char('Period')
+    debit = fields.Monetary(default=0.0, currency_field='company_currency_id')
+    credit = fields.Monetary(default=0.0, currency_field='company_currency_id')
+    balance = fields.Monetary(default=0.0, currency_field='company_currency_id')
+    company_currency_id = fields.Many2one('res.currency')
+
+    @api.model_cr
+    def init(self):
+        create_index(self.env.cr, 'account_report_standard_ledger_comparison_report_index', self._table,
+                     ['report_id', 'report_object_id'])
 
 
 class AccountStandardLedger(models.TransientModel):
@@ -207,6 +555,10 @@ class AccountStandardLedger(models.TransientModel):
     company_currency_id = fields.Many2one('res.currency', related='company_id.currency_id',
                                           string="Company Currency", readonly=True,
                                           help='Utility field to express amount currency', store=True)
+    company_ids = fields.Many2many('res.company', relation='table_standard_report_company', string='Consolidated Companies',
+                                   help='Companies of the currency of the company consolidated in one report, '
+                                   'with a subtotal of each object by company.\n'
+                                   'If empty, get the company only.')
     journal_ids = fields.Many2many('account.journal', string='Journals', required=True,
                                    default=lambda self: self.env['account.journal'].search(
                                        [('company_id', '=', self.env.user.company_id.id)]),
@@ -229,13 +581,39 @@ class AccountStandardLedger(models.TransientModel):
                                          ], string="Partners Selection", required=True, default='supplier')
     report_name = fields.Char('Report Name')
     compact_account = fields.Boolean('Compacte account.', default=False)
+    aged_period_length = fields.Integer('Period Length (days)', default=30,
+                                        help='Number of days of each column of the Aged Balance.')
+    excel_layout = fields.Selection([('both', 'Grouped and flat sheets'),
+                                     ('grouped', 'Sheet grouped by object'),
+                                     ('flat', 'Flat sheet'),
+                                     ('outline', 'Flat sheet outlined by object'),
+                                     ], string='Excel Layout', default='both', required=True,
+                                    help='Sheets of the detail Excel report:\n'
+                                    ' * Grouped and flat sheets : every line is written twice.\n'
+                                    ' * Flat sheet outlined by object : one sheet with the lines of each object in an outline level.\n')
+    comparison = fields.Selection([('month', 'Months of the period'),
+                                   ('periode', 'Periods'),
+                                   ], string='Comparison',
+                                  help='Only for the General Ledger: balance of each account in each period, side by side.\n'
+                                  ' * Months of the period : one column by month from the Start Date to the End Date.\n'
+                                  ' * Periods : one column by compared period.\n')
+    comparison_periode_ids = fields.Many2many('account.report.standard.ledger.periode', relation='table_standard_report_comparison_periode',
+                                              string='Compared Periods')
     report_id = fields.Many2one('account.report.standard.ledger.report')
+    report_key = fields.Char(help='Hash of the parameters of the computed report.')
+    report_stat_ids = fields.One2many(related='report_id.stat_ids', string='Statistics', readonly=True)
     account_ids = fields.Many2many('account.account', relation='table_standard_report_accounts')
     partner_ids = fields.Many2many('res.partner', string="Partners in report", relation='table_standard_report_partner')
     report_type = fields.Selection([('account', 'Account'), ('partner', 'Partner'), ('journal', 'Journal'),
                                     ('analytic', 'Analytic')], string='Report Type')
     template_id = fields.Many2one('account.report.template', 'Template')
 
+    @api.constrains('aged_period_length')
+    def _check_aged_period_length(self):
+        for record in self:
+            if record.aged_period_length <= 0:
+                raise ValidationError(_('The period length of the Aged Balance must be greater than 0.'))
+
     @api.onchange('account_in_ex_clude_ids')
     def _onchange_account_in_ex_clude_ids(self):
         if self.account_in_ex_clude_ids:
@@ -243,6 +621,10 @@ class AccountStandardLedger(models.TransientModel):
         else:
             self.account_methode = False
 
+    @api.onchange('company_ids')
+    def _onchange_company_ids(self):
+        self.journal_ids = self.env['account.journal'].search([('company_id', 'in', self._get_companies().ids)])
+
     @api.onchange('ledger_type')
     def _onchange_ledger_type(self):
         if self.ledger_type in ('partner', 'journal', 'open', 'aged'):
@@ -283,7 +665,15 @@ class AccountStandardLedger(models.TransientModel):
 
     def action_view_lines(self):
         self.ensure_one()
-        self._compute_data()
+        # the lines of each object are computed when its group is opened
+        self._compute_data(lazy=True)
+        context = {'search_default_%s' % self.ledger_type: 1}
+        if self.summary:
+            # the trial balance only computes the totals
+            domain = [('report_id', '=', self.report_id.id), ('line_type', '=', '4_total')]
+        else:
+            domain = [('report_id', '=', self.report_id.id), ('line_type', 'not in', ('5_super_total', '4_total'))]
+            context['group_by'] = 'report_object_id'
         return {
             'name': self.report_id.name,
             'view_type': 'form',
@@ -291,11 +681,22 @@ class AccountStandardLedger(models.TransientModel):
             'views': [(self.env.ref('account_standard_report.view_aged_tree').id if self.ledger_type == 'aged' else False, 'tree'), (False, 'form')],
             'res_model': 'account.report.standard.ledger.line',
             'type': 'ir.actions.act_window',
-            'domain': [('report_id', '=', self.report_id.id), ('line_type', 'not in', ('5_super_total', '4_total'))],
-            'context': {'search_default_%s' % self.ledger_type: 1},
+            'domain': domain,
+            'context': context,
             'target': 'current',
         }
 
+    def action_refresh_report(self):
+        """ Apply the entries written since the computation of the report,
+        even if none was posted, then display its lines. """
+        self.ensure_one()
+        if self.target_move != 'posted':
+            # the draft entries are deleted without trace, recompute all
+            self.report_key = False
+        elif self.report_id:
+            self.report_id.cache_key = False
+        return self.action_view_lines()
+
     def print_pdf_report(self):
         self.ensure_one()
         self._compute_data()
@@ -306,22 +707,82 @@ class AccountStandardLedger(models.TransientModel):
         self._compute_data()
         return self.env.ref('account_standard_report.action_standard_excel').report_action(self)
 
-    def _pre_compute(self):
-        lang_code = self.env.context.get('lang') or 'en_US'
-        date_format = self.env['res.lang']._lang_get(lang_code).date_format
-        time_format = self.env['res.lang']._lang_get(lang_code).time_format
+    def queue_pdf_report(self):
+        return self._queue_report('pdf')
 
-        vals = {'report_name': self._get_name_report(),
-                'name': self._get_name_report(),
-                'print_time': '%s' % fields.Datetime.context_timestamp(self.with_context(tz=self.env.user.tz), fields.Datetime.now()).strftime(('%s %s') % (date_format, time_format)),
-                'date_to': self.date_to if self.date_to else "2099-01-01",
-                'date_from': self.date_from if self.date_from else "1970-01-01",
-                }
-        self.report_id = self.env['account.report.standard.ledger.report'].create(vals)
-        self.account_ids = self._search_account()
-        self.partner_ids = self._search_partner()
-        self.analytic_account_ids = self._search_analytic_account()
+    def queue_excel_report(self):
+        return self._queue_report('xlsx')
+
+    def _queue_report(self, report_format):
+        """ Generate the report in background, for the long reports. """
+        self.ensure_one()
+        job = self.env['account.report.standard.ledger.job'].create({
+            'name': self._get_name_report(),
+            'wizard_id': self.id,
+            'report_format': report_format,
+            'company_id': self.company_id.id,
+        })
+        return {
+            'name': job.name,
+            'view_type': 'form',
+            'view_mode': 'form',
+            'res_model': 'account.report.standard.ledger.job',
+            'res_id': job.id,
+            'type': 'ir.actions.act_window',
+            'target': 'current',
+        }
+
+    def export_csv_report(self):
+        return self._export_report('csv')
+
+    def export_parquet_report(self):
+        return self._export_report('parquet')
+
+    def _export_report(self, export_format):
+        """ Download the raw lines of the report, see `_export_line_for_report`. """
+        self.ensure_one()
+        if export_format == 'parquet' and pyarrow is None:
+            raise UserError(_('The Parquet export needs the Python library pyarrow.'))
+        self._compute_data()
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/account_standard_report/export/%s/%s' % (self.id, export_format),
+            'target': 'self',
+        }
 
+    def _export_line_for_report(self, fileobj, export_format='csv'):
+        """ Write the lines of the report in `fileobj`, in CSV straight from
+        PostgreSQL with COPY, or in Parquet converted from this CSV by batches.
+        """
+        self.env['account.move.line'].check_access_rights('read')
+        if self.summary:
+            type_l = ('4_total',)
+        elif self.ledger_type == 'aged':
+            type_l = ('1_init_line', '2_line')
+        else:
+            type_l = ('0_init', '1_init_line', '2_line', '3_compact')
+        query, params = self._get_line_for_report_query(type_l, order_by_object=True)
+        query = self.env.cr.mogrify(query, params).decode('utf-8')
+        if export_format == 'csv':
+            self.env.cr.copy_expert('COPY (%s) TO STDOUT WITH (FORMAT csv, HEADER)' % query, fileobj)
+            return
+
+        # the types of the columns, not guessed from the first lines
+        self.env.cr.execute('SELECT * FROM (%s) lines LIMIT 0' % query)
+        types = {16: pyarrow.bool_(), 20: pyarrow.int64(), 23: pyarrow.int64(), 700: pyarrow.float64(),
+                 701: pyarrow.float64(), 1082: pyarrow.date32(), 1700: pyarrow.float64()}
+        column_types = {column.name: types.get(column.type_code, pyarrow.string())
+                        for column in self.env.cr.description}
+        with tempfile.TemporaryFile() as csv_file:
+            self.env.cr.copy_expert('COPY (%s) TO STDOUT WITH (FORMAT csv, HEADER)' % query, csv_file)
+            csv_file.seek(0)
+            reader = pyarrow.csv.open_csv(csv_file, convert_options=pyarrow.csv.ConvertOptions(
+                column_types=column_types, strings_can_be_null=True))
+            with pyarrow.parquet.ParquetWriter(fileobj, reader.schema) as writer:
+                for batch in reader:
+                    writer.write_table(pyarrow.Table.from_batches([batch], schema=reader.schema))
+
+    def _pre_compute(self):
         if self.ledger_type in ('general', 'open'):
             self.report_type = 'account'
         elif self.ledger_type in ('partner', 'aged'):
@@ -337,34 +798,467 @@ class AccountStandardLedger(models.TransientModel):
             self.reconciled = True
             self.partner_select_ids = False
 
-    def _compute_data(self):
+        if self.comparison == 'month' and self.ledger_type == 'general' and not (self.date_from and self.date_to):
+            raise UserError(_('The comparison of the months needs a Start Date and an End Date.'))
+        if len(self._get_comparison_periods()) > MAX_COMPARISON_PERIODS:
+            raise UserError(_('At most %s periods can be compared.') % MAX_COMPARISON_PERIODS)
+
+        # the entries are read in SQL, without the record rules
+        for company in self.company_ids:
+            if company not in self.env.user.company_ids:
+                raise AccessError(_('You are not allowed to access the entries of the company %s.') % company.name)
+            if company.currency_id != self.company_currency_id:
+                raise UserError(_('The company %s can not be consolidated, its currency is not %s.')
+                                % (company.name, self.company_currency_id.name))
+
+    def _get_cache_key(self):
+        """ Hash of the parameters of the report. """
+        values = [self.company_id.id, sorted(self.company_ids.ids), self.env.uid, self.env.context.get('lang')]
+        for field in FIELDS_TEMPLATE:
+            # the layout of the Excel report does not change the lines
+            if field in ('name', 'excel_layout'):
+                continue
+            value = self[field]
+            if isinstance(value, models.BaseModel):
+                value = sorted(value.ids)
+            values.append((field, value))
+        values.append(('comparison', self._get_comparison_periods()))
+        return hashlib.sha1(repr(values).encode('utf-8')).hexdigest()
+
+    def _create_report(self, cache_key=False):
+        lang_code = self.env.context.get('lang') or 'en_US'
+        date_format = self.env['res.lang']._lang_get(lang_code).date_format
+        time_format = self.env['res.lang']._lang_get(lang_code).time_format
+
+        vals = {'report_name': self._get_name_report(),
+                'name': self._get_name_report(),
+                'print_time': '%s' % fields.Datetime.context_timestamp(self.with_context(tz=self.env.user.tz), fields.Datetime.now()).strftime(('%s %s') % (date_format, time_format)),
+                'date_to': self.date_to if self.date_to else "2099-01-01",
+                'date_from': self.date_from if self.date_from else "1970-01-01",
+                'date_max': self._get_date_max(),
+                'company_id': self.company_id.id,
+                'company_ids': [(6, 0, self._get_companies().ids)],
+                'journal_ids': [(6, 0, self.journal_ids.ids)],
+                'cache_key': cache_key,
+                'refresh_date': self._get_refresh_date(),
+                }
+        self.report_id = self.env['account.report.standard.ledger.report'].create(vals)
+        self.account_ids = self._search_account()
+        self.partner_ids = self._search_partner()
+
+    def _compute_data(self, progress=None, lazy=False):
+        """ Compute the report, unless computed with the same options. If
+        `lazy`, only the totals of a detailed report are computed, its lines
+        when displayed, see _compute_lazy_lines. """
         if not self.user_has_groups('account.group_account_user'):
             raise UserError(_('Your are not an accountant.'))
         self.env['account.move.line'].check_access_rights('read')
         self._pre_compute()
-
-        self._sql_report_object()
+        self._compute_report(progress=progress, lazy=lazy and not self.summary and self._has_independent_objects())
+        self.report_id.use_date = fields.Datetime.now()
+        if self.report_id.lazy and not lazy:
+            # printed or exported
+            self._complete_lazy_report()
+
+    def _compute_report(self, progress=None, lazy=False):
+        """ Reuse, refresh or compute the report of the options. """
+        # the posted entries only change on posting or cancelling a move,
+        # which invalidates the reports computed before
+        report_obj = self.env['account.report.standard.ledger.report']
+        cache_key = self._get_cache_key()
+        posted = self.target_move == 'posted'
+        if self.report_id and self.report_key == cache_key and (not posted or self.report_id.cache_key):
+            # same options as the last computation, for the list, the PDF and the Excel
+            return
+        previous_report = self.report_id
+        report = posted and report_obj._get_cached(cache_key)
+        if report:
+            self.report_id = report
+            # the lines of a lazy report are computed on demand with the
+            # accounts and partners of its wizard
+            self.account_ids = self._search_account()
+            self.partner_ids = self._search_partner()
+        elif posted and previous_report and self.report_key == cache_key and self._is_refreshable():
+            # same options, only the entries posted since are applied
+            self._refresh_report_lines(cache_key, progress=progress)
+            return
+        else:
+            self._create_report(cache_key if posted else False)
+        self.report_key = cache_key
+        if previous_report and not previous_report.cache_key:
+            # not reusable by other computations
+            previous_report.unlink()
+        if not report:
+            report_obj._evict_cache()
+            self._compute_report_lines(progress=progress, lazy=lazy)
+
+    def _get_compute_stages(self, lazy=False):
+        """ Ordered list of the SQL stages computing the lines of the report,
+        only its totals if `lazy`. """
+        stages = ['_sql_report_object']
         if self.report_type == 'account':
-            self._sql_unaffected_earnings()
-        if self.report_type in ('account, partner'):
-            if self.ledger_type != 'aged':
-                self._sql_init_balance()
-        self._sql_lines()
-        if self.compact_account and self.ledger_type == 'general':
-            self._sql_lines_compacted()
-        self._sql_total()
-        self._sql_super_total()
+            stages.append('_sql_unaffected_earnings')
+        if self.report_type in ('account', 'partner') and self.ledger_type != 'aged':
+            stages.append('_sql_init_balance')
+        if self.summary or lazy:
+            # only the totals are displayed, do not insert the lines
+            stages.append('_sql_summary_total')
+        else:
+            stages.append('_sql_lines')
+            if self.compact_account and self.ledger_type == 'general':
+                stages.append('_sql_lines_compacted')
+            stages.append('_sql_total')
+        stages.append('_sql_super_total')
+        if self._get_comparison_periods():
+            stages.append('_sql_comparison')
+        return stages
+
+    def _compute_report_lines(self, progress=None, lazy=False):
+        stages = self._get_compute_stages(lazy=lazy)
+        workers = self._get_parallel_workers()
+        index = 0
+        for parallel, group in groupby(stages, key=lambda stage: workers > 1 and stage in PARALLEL_STAGES):
+            group = list(group)
+            if parallel:
+                if progress:
+                    progress(group[0], index, len(stages))
+                for stat in self._compute_parallel(group, workers):
+                    self.report_id._add_stat(*stat)
+                index += len(group)
+                continue
+            for stage in group:
+                if progress:
+                    progress(stage, index, len(stages))
+                start = time.time()
+                row_count, plan = getattr(self, stage)() or (0, False)
+                self.report_id._add_stat(stage, time.time() - start, row_count, plan)
+                index += 1
         self.refresh()
 
         # complet total line
-        line_obj = self.env['account.report.standard.ledger.line']
-        self.report_id.line_total_ids = line_obj.search([('report_id', '=', self.report_id.id), ('line_type', '=', '4_total')])
-        self.report_id.line_super_total_id = line_obj.search([('report_id', '=', self.report_id.id), ('line_type', '=', '5_super_total')], limit=1)
+        start = time.time()
         self._format_total()
+        self.report_id._add_stat('_format_total', time.time() - start, len(self.report_id.line_total_ids) + 1)
+        self.report_id.lazy = lazy
+
+    def _compute_lazy_lines(self, report_object, count=None):
+        """ Insert the lines of `report_object` in its lazy report until it
+        has `count` lines, all of them without `count`. The lines are
+        inserted by pages in their order, each page following the last
+        line inserted, its cumulated balance carried from this line. """
+        self.ensure_one()
+        report = self.report_id
+        cr = self.env.cr
+        cr.execute("""SELECT
+                COUNT(*) FILTER (WHERE line_type NOT IN ('4_total', '5_super_total')),
+                COALESCE(MAX(line_count) FILTER (WHERE line_type = '4_total'), 0)
+            FROM
+                account_report_standard_ledger_line
+            WHERE
+                report_id = %s
+                AND report_object_id = %s""", (report.id, report_object.id))
+        done, line_count = cr.fetchone()
+        if done >= (line_count if count is None else min(count, line_count)):
+            return
+        cr.execute("""SELECT date, move_line_id, cumul_balance
+            FROM
+                account_report_standard_ledger_line
+            WHERE
+                report_id = %s
+                AND report_object_id = %s
+                AND line_type IN ('1_init_line', '2_line')
+            ORDER BY
+                id DESC
+            LIMIT 1""", (report.id, report_object.id))
+        wizard = self.with_context(report_refresh_object_ids=[report_object.id], report_lines_after=cr.fetchone(),
+                                   report_lines_limit=None if count is None else count - done)
+        start = time.time()
+        row_count, plan = wizard._sql_lines()
+        if self.compact_account and self.ledger_type == 'general' and done + row_count < line_count \
+                and (count is None or row_count < count - done):
+            # after the last page of the lines, the compacted line
+            row_count += wizard._sql_lines_compacted()[0]
+        report._add_stat('_compute_lazy_lines', time.time() - start, row_count, plan)
+
+    def _complete_lazy_report(self):
+        """ Insert all the lines of the lazy report, instead of the ones
+        inserted on demand. """
+        self.ensure_one()
+        report = self.report_id
+        self.env.cr.execute("DELETE FROM account_report_standard_ledger_line "
+                            "WHERE report_id = %s AND line_type IN ('1_init_line', '2_line', '3_compact')", (report.id,))
+        stages = ['_sql_lines']
+        if self.compact_account and self.ledger_type == 'general':
+            stages.append('_sql_lines_compacted')
+        for stage in stages:
+            start = time.time()
+            row_count, plan = getattr(self, stage)() or (0, False)
+            report._add_stat(stage, time.time() - start, row_count, plan)
+        report.lazy = False
+
+    def _refresh_report_lines(self, cache_key, progress=None):
+        """ Apply to the report the journal items written since its
+        computation: the report objects of these journal items are
+        recomputed whole, with their cumulated balance, the other objects
+        are kept. Recomputing an object twice gives the same lines, so the
+        journal items written during the computation can be applied again. """
+        report = self.report_id
+        refresh_date = report.refresh_date
+        report.refresh_date = self._get_refresh_date()
+        # the accounts and partners created since
+        self.account_ids = self._search_account()
+        self.partner_ids = self._search_partner()
+
+        start = time.time()
+        row_count, plan = self.with_context(report_refresh_date=refresh_date)._sql_report_object() or (0, False)
+        report._add_stat('_sql_report_object', time.time() - start, row_count, plan)
+        start = time.time()
+        object_ids, companies = self._get_refresh_objects(refresh_date)
+        if self.report_type == 'account':
+            # the initial balance of the unaffected earnings objects is
+            # recomputed with their lines
+            unaffected_type = self.env.ref('account.data_unaffected_earnings')
+            object_obj = self.env['account.report.standard.ledger.report.object']
+            unaffected = object_obj.search([('report_id', '=', report.id),
+                                            ('account_id.user_type_id', '=', unaffected_type.id)])
+            companies |= unaffected.filtered(lambda o: o.id in object_ids).mapped('account_id.company_id')
+            object_ids |= set(unaffected.filtered(lambda o: o.account_id.company_id in companies).ids)
+        report._add_stat('_get_refresh_objects', time.time() - start, len(object_ids))
+        if not object_ids and not companies:
+            report.cache_key = cache_key
+            return
+
+        self.env.cr.execute("DELETE FROM account_report_standard_ledger_line "
+                            "WHERE report_id = %s AND (report_object_id = ANY(%s::int[]) OR line_type = '5_super_total')",
+                            (report.id, list(object_ids)))
+        self.env.cr.execute("DELETE FROM account_report_standard_ledger_comparison "
+                            "WHERE report_id = %s AND report_object_id = ANY(%s::int[])", (report.id, list(object_ids)))
+        if companies:
+            start = time.time()
+            row_count = 0
+            for company in companies:
+                row_count += (self._sql_company_unaffected_earnings(company) or (0, False))[0]
+            report._add_stat('_sql_unaffected_earnings', time.time() - start, row_count)
+            # created if there was no unaffected earnings
+            object_ids |= set(object_obj.search([('report_id', '=', report.id),
+                                                 ('account_id.user_type_id', '=', unaffected_type.id)]).ids)
+
+        wizard = self.with_context(report_refresh_object_ids=sorted(object_ids))
+        stages = [stage for stage in self._get_compute_stages(lazy=report.lazy)
+                  if stage not in ('_sql_report_object', '_sql_unaffected_earnings')]
+        for index, stage in enumerate(stages):
+            if progress:
+                progress(stage, index, len(stages))
+            start = time.time()
+            row_count, plan = getattr(wizard, stage)() or (0, False)
+            report._add_stat(stage, time.time() - start, row_count, plan)
+        self.refresh()
+
+        start = time.time()
+        wizard._format_total()
+        report._add_stat('_format_total', time.time() - start, len(object_ids) + 1)
+        report.cache_key = cache_key
+
+    def _is_refreshable(self):
+        """ Whether the report can be refreshed object by object. """
+        report = self.report_id
+        if not report.refresh_date or report.refresh_full:
+            return False
+        return self._has_independent_objects()
+
+    def _has_independent_objects(self):
+        """ Whether the lines of each report object are computed apart from
+        the other objects. """
+        # the cumulated balance of the analytic lines runs by journal, over
+        # all the analytic accounts
+        return self.report_type != 'analytic' or self.summary
+
+    def _get_refresh_date(self):
+        """ High-water mark of the journal items read by a computation: the
+        start of the oldest transaction running, whose journal items may be
+        committed later with an earlier write date. """
+        self.env.cr.execute("""SELECT LEAST(NOW(), MIN(xact_start)) AT TIME ZONE 'UTC'
+            FROM pg_stat_activity
+            WHERE datname = current_database()""")
+        return self.env.cr.fetchone()[0]
+
+    def _get_refresh_objects(self, refresh_date):
+        """ Ids of the report objects of the journal items written since
+        `refresh_date`, new or previous, and the companies whose unaffected
+        earnings changed. """
+        query = """WITH changed AS (
+                SELECT
+                    aml.id, aml.company_id, aml.account_id, aml.partner_id, aml.journal_id, aml.analytic_account_id, aml.date
+                FROM
+                    account_move_line aml
+                WHERE
+                    aml.company_id = ANY(%s::int[])
+                    AND aml.date <= %s
+                    AND (aml.write_date > %s OR aml.move_id IN (SELECT id FROM account_move WHERE write_date > %s))
+            )
+
+            SELECT
+                ro.id, NULL::int
+            FROM
+                changed aml
+                INNER JOIN account_report_standard_ledger_report_object ro ON (
+                    CASE
+                        WHEN %s = 'account' THEN aml.account_id = ro.object_id
+                        WHEN %s = 'partner' THEN aml.partner_id = ro.object_id
+                        WHEN %s = 'analytic' THEN aml.analytic_account_id = ro.object_id
+                        ELSE aml.journal_id = ro.object_id
+                    END
+                    AND (ro.company_id IS NULL OR aml.company_id = ro.company_id))
+            WHERE
+                ro.report_id = %s
+
+            UNION
+
+            -- the objects of the journal items before they were written
+            SELECT
+                l.report_object_id, NULL::int
+            FROM
+                changed aml
+                INNER JOIN account_report_standard_ledger_line l ON (l.move_line_id = aml.id)
+            WHERE
+                l.report_id = %s
+
+            UNION
+
+            -- the earnings before the start date, or before a compared period
+            SELECT
+                NULL, aml.company_id
+            FROM
+                changed aml
+                INNER JOIN account_account acc ON (aml.account_id = acc.id)
+                INNER JOIN account_account_type acc_type ON (acc.user_type_id = acc_type.id)
+            WHERE
+                %s = 'account'
+                AND acc_type.include_initial_balance = FALSE
+                AND (aml.date < %s OR %s)
+            """
+        periods = self._get_comparison_periods()
+        params = [
+            # changed
+            self._get_companies().ids,
+            self._get_date_max(),
+            refresh_date, refresh_date,
+            # objects
+            self.report_type, self.report_type, self.report_type,
+            self.report_id.id,
+            # previous objects
+            self.report_id.id,
+            # unaffected earnings
+            self.report_type,
+            self.report_id.date_from, bool(periods),
+        ]
+        self.env.cr.execute(query, tuple(params))
+        object_ids, company_ids = set(), set()
+        for object_id, company_id in self.env.cr.fetchall():
+            if object_id:
+                object_ids.add(object_id)
+            if company_id:
+                company_ids.add(company_id)
+        return object_ids, self.env['res.company'].browse(company_ids)
+
+    def _get_parallel_workers(self):
+        """ Number of transactions computing the report objects at once.
+        The report is committed before, so only the jobs generating the
+        reports in background compute them in parallel. """
+        if not self.env.context.get('standard_report_parallel') or config['test_enable']:
+            return 1
+        if not self._has_independent_objects():
+            return 1
+        return int(self.env['ir.config_parameter'].sudo().get_param(
+            'account_standard_report.parallel_workers', PARALLEL_WORKERS))
+
+    def _get_object_range(self):
+        """ Bounds of the ids of the report objects computed by the stages,
+        all of them out of a parallel computation. """
+        return self.env.context.get('report_object_range') or (0, 2 ** 31 - 1)
+
+    def _get_object_filter(self):
+        """ Bounds of the ids of the report objects computed by the stages,
+        then whether all the objects in these bounds are computed, else the
+        ids of the ones refreshed. """
+        object_ids = self.env.context.get('report_refresh_object_ids')
+        return self._get_object_range() + (object_ids is None, object_ids or [])
+
+    def _get_object_ranges(self, count):
+        """ Split the objects of the report in at most `count` ranges of ids
+        holding as many objects. """
+        self.env.cr.execute("""SELECT MIN(id), MAX(id)
+            FROM (
+                SELECT id, NTILE(%s) OVER (ORDER BY id) AS tile
+                FROM account_report_standard_ledger_report_object
+                WHERE report_id = %s
+            ) ro
+            GROUP BY tile
+            ORDER BY 1""", (count, self.report_id.id))
+        return self.env.cr.fetchall()
+
+    def _compute_parallel(self, stages, workers):
+        """ Run `stages` on ranges of report objects, each range in its own
+        transaction, and return the statistics of the stages summed over
+        the ranges.
+
+        The report and its objects are committed first, to be visible in
+        the transactions of the ranges, without their cache key and not
+        refreshable until all the lines are computed. """
+        report = self.report_id
+        cache_key = report.cache_key
+        report.write({'cache_key': False, 'refresh_full': True})
+        ranges = self._get_object_ranges(workers * PARALLEL_RANGES)
+        self.env.cr.commit()
+        _logger.info('Computing the standard report %s in %s ranges of objects', report.id, len(ranges))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(lambda object_range: self._compute_range(stages, object_range), ranges))
+        report.write({'cache_key': cache_key, 'refresh_full': False})
+
+        stats = []
+        for index, stage in enumerate(stages):
+            stage_stats = [result[index] for result in results]
+            stats.append((stage,
+                          sum(duration for duration, row_count, plan in stage_stats),
+                          sum(row_count for duration, row_count, plan in stage_stats),
+                          next((plan for duration, row_count, plan in stage_stats if plan), False)))
+        return stats
+
+    def _compute_range(self, stages, object_range):
+        """ Run in a thread: compute `stages` on the report objects of
+        `object_range` in a new transaction, return the duration, the number
+        of rows and the plan of each stage. """
+        with api.Environment.manage(), self.pool.cursor() as cr:
+            wizard = self.with_env(self.env(cr=cr)).with_context(report_object_range=object_range)
+            result = []
+            for stage in stages:
+                start = time.time()
+                row_count, plan = getattr(wizard, stage)() or (0, False)
+                result.append((time.time() - start, row_count, plan))
+            return result
+
+    def _execute(self, query, params):
+        """ Execute a query of the pipeline, return the number of rows and
+        the plan of the query if enabled. """
+        cr = self.env.cr
+        if not self.env['ir.config_parameter'].sudo().get_param('account_standard_report.explain_analyze'):
+            cr.execute(query, params)
+            return cr.rowcount, False
+        # EXPLAIN ANALYZE executes the query
+        cr.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + query, params)
+        plan = cr.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        # the INSERT node returns no row, count the rows of its source
+        node = plan[0]['Plan']
+        if node['Node Type'] == 'ModifyTable' and node.get('Plans'):
+            node = node['Plans'][0]
+        return int(node['Actual Rows'] * node['Actual Loops']), json.dumps(plan, indent=2)
 
     def _sql_report_object(self):
+        refresh_date = self.env.context.get('report_refresh_date')
         query = """INSERT INTO  account_report_standard_ledger_report_object
-            (report_id, create_uid, create_date, object_id, name, account_id, partner_id, journal_id, analytic_account_id)
+            (report_id, create_uid, create_date, object_id, name, account_id, partner_id, journal_id, analytic_account_id, company_id)
             SELECT DISTINCT
                 %s AS report_id,
                 %s AS create_uid,
@@ -380,23 +1274,41 @@ class AccountStandardLedger(models.TransientModel):
                     WHEN %s = 'partner' THEN CASE WHEN rep.ref IS NULL THEN rep.name ELSE rep.ref || ' ' || rep.name END
                     WHEN %s = 'analytic' THEN CASE WHEN an_acc.code IS NULL THEN an_acc.name ELSE an_acc.code || ' ' || an_acc.code END
                     ELSE acj.code || ' ' || acj.name
-                END AS name,
+                END || CASE WHEN %s THEN ' - ' || com.name ELSE '' END AS name,
                 CASE WHEN %s = 'account' THEN aml.account_id ELSE NULL END AS account_id,
                 CASE WHEN %s = 'partner' THEN aml.partner_id ELSE NULL END AS partner_id,
                 CASE WHEN %s = 'journal' THEN aml.journal_id ELSE NULL END AS journal_id,
-                CASE WHEN %s = 'analytic' THEN aml.analytic_account_id ELSE NULL END AS analytic_account_id
+                CASE WHEN %s = 'analytic' THEN aml.analytic_account_id ELSE NULL END AS analytic_account_id,
+                -- one object by company in a consolidated report
+                CASE WHEN %s THEN aml.company_id ELSE NULL END AS company_id
             FROM
                 account_move_line aml
                 LEFT JOIN account_account acc ON (acc.id = aml.account_id)
                 LEFT JOIN res_partner rep ON (rep.id = aml.partner_id)
                 LEFT JOIN account_journal acj ON (acj.id = aml.journal_id)
                 LEFT JOIN account_analytic_account an_acc ON (acj.id = aml.analytic_account_id)
+                LEFT JOIN res_company com ON (com.id = aml.company_id)
             WHERE
-                aml.company_id = %s
-                AND aml.journal_id IN %s
-                AND aml.account_id IN %s
-                AND (%s IN ('account','journal','analytic') OR aml.partner_id IN %s)
-                AND (%s != 'analytic' OR aml.analytic_account_id IN %s)
+                aml.company_id = ANY(%s::int[])
+                AND aml.journal_id = ANY(%s::int[])
+                AND aml.account_id = ANY(%s::int[])
+                AND (%s IN ('account','journal','analytic') OR (%s AND aml.partner_id IS NOT NULL) OR aml.partner_id = ANY(%s::int[]))
+                AND (%s != 'analytic' OR (%s AND aml.analytic_account_id IS NOT NULL) OR aml.analytic_account_id = ANY(%s::int[]))
+                -- on a refresh, only the missing objects of the entries written since the last computation
+                AND (%s::timestamp IS NULL OR (
+                    (aml.write_date > %s OR aml.move_id IN (SELECT id FROM account_move WHERE write_date > %s))
+                    AND NOT EXISTS (
+                        SELECT 1
+                        FROM account_report_standard_ledger_report_object ro
+                        WHERE
+                            ro.report_id = %s
+                            AND ro.object_id = CASE
+                                WHEN %s = 'account' THEN aml.account_id
+                                WHEN %s = 'partner' THEN aml.partner_id
+                                WHEN %s = 'analytic' THEN aml.analytic_account_id
+                                ELSE aml.journal_id
+                            END
+                            AND (ro.company_id IS NULL OR ro.company_id = aml.company_id))))
             ORDER BY
                 name
             """
@@ -407,31 +1319,60 @@ class AccountStandardLedger(models.TransientModel):
             self.env.uid,
             self.report_type, self.report_type, self.report_type,
             self.report_type, self.report_type, self.report_type,
+            self._is_consolidated(),
             self.report_type, self.report_type, self.report_type, self.report_type,
+            self._is_consolidated(),
             # WHERE
-            self.company_id.id,
-            tuple(self.journal_ids.ids) if self.journal_ids else (None,),
-            tuple(self.account_ids.ids) if self.account_ids else (None,),
+            self._get_companies().ids,
+            self.journal_ids.ids,
+            self.account_ids.ids,
             self.report_type,
-            tuple(self.partner_ids.ids) if self.partner_ids else (None,),
+            *self._get_partner_filter(),
             self.report_type,
-            tuple(self.analytic_account_ids.ids) if self.analytic_account_ids else (None,),
+            *self._get_analytic_account_filter(),
+            refresh_date, refresh_date, refresh_date,
+            self.report_id.id,
+            self.report_type, self.report_type, self.report_type,
         ]
 
-        self.env.cr.execute(query, tuple(params))
+        return self._execute(query, tuple(params))
+
+    def _get_balance_snapshot_date(self):
+        """ Return whether the initial balance can be read from the balance
+        snapshots, and the first day not covered by the snapshots to use.
+        Snapshots only hold posted entries of all journals. """
+        self.ensure_one()
+        companies = self._get_companies()
+        company_journals = self.env['account.journal'].search([('company_id', 'in', companies.ids)])
+        use_snapshot = bool(all(companies.mapped('balance_snapshot_date')) and self.target_move == 'posted'
+                            and not company_journals - self.journal_ids)
+        return use_snapshot, self.report_id.date_from.replace(day=1)
 
     def _sql_unaffected_earnings(self):
-        company = self.company_id
+        """ Initial balance of the unaffected earnings account of each
+        company, from its own fiscal year. """
+        row_count, plan = 0, False
+        for company in self._get_companies():
+            company_row_count, company_plan = self._sql_company_unaffected_earnings(company) or (0, False)
+            row_count += company_row_count
+            plan = plan or company_plan
+        return row_count, plan
+
+    def _sql_company_unaffected_earnings(self, company):
         unaffected_earnings_account = self.env['account.account'].search([('company_id', '=', company.id), ('user_type_id', '=', self.env.ref('account.data_unaffected_earnings').id)], limit=1)
         if unaffected_earnings_account not in self.account_ids:
             return
 
         report_object_id = self.report_id.report_object_ids.filtered(lambda x: x.object_id == unaffected_earnings_account.id)
         if not report_object_id:
+            name = '%s %s' % (unaffected_earnings_account.code, unaffected_earnings_account.name)
+            if self._is_consolidated():
+                name = '%s - %s' % (name, company.name)
             report_object_id = self.report_id.report_object_ids.create({'report_id': self.report_id.id,
                                                                         'object_id': unaffected_earnings_account.id,
-                                                                        'name': '%s %s' % (unaffected_earnings_account.code, unaffected_earnings_account.name),
-                                                                        'account_id': unaffected_earnings_account.id})
+                                                                        'name': name,
+                                                                        'account_id': unaffected_earnings_account.id,
+                                                                        'company_id': self._is_consolidated() and company.id})
         query = """
         INSERT INTO account_report_standard_ledger_line
             (report_id, create_uid, create_date, account_id, line_type, view_type, date, debit, credit, balance, cumul_balance, company_currency_id, reconciled, report_object_id)
@@ -451,15 +1392,33 @@ class AccountStandardLedger(models.TransientModel):
             FALSE as reconciled,
             %s AS report_object_id
         FROM
-            account_move_line aml
+            (
+            SELECT
+                aml.account_id, aml.debit, aml.credit, aml.balance
+            FROM
+                account_move_line aml
+                LEFT JOIN account_move m ON (aml.move_id = m.id)
+            WHERE
+                m.state IN %s
+                AND aml.company_id = %s
+                AND aml.date < %s
+                AND (NOT %s OR aml.date >= %s)
+
+            UNION ALL
+
+            SELECT
+                snap.account_id, snap.debit, snap.credit, snap.balance
+            FROM
+                account_report_balance_snapshot snap
+            WHERE
+                %s
+                AND snap.company_id = %s
+                AND snap.period < %s
+            ) aml
             LEFT JOIN account_account acc ON (aml.account_id = acc.id)
             LEFT JOIN account_account_type acc_type ON (acc.user_type_id = acc_type.id)
-            LEFT JOIN account_move m ON (aml.move_id = m.id)
         WHERE
-            m.state IN %s
-            AND aml.company_id = %s
-            AND aml.date < %s
-            AND acc_type.include_initial_balance = FALSE
+            acc_type.include_initial_balance = FALSE
         HAVING
             CASE
                 WHEN %s = FALSE THEN ABS(SUM(aml.balance)) > %s
@@ -467,9 +1426,10 @@ class AccountStandardLedger(models.TransientModel):
             END
         """
 
-        date_from_fiscal = self.company_id.compute_fiscalyear_dates(self.report_id.date_from)['date_from']
+        date_from_fiscal = company.compute_fiscalyear_dates(self.report_id.date_from)['date_from']
         rouding = self.company_currency_id.rounding / 2
-        
+        use_snapshot, snapshot_date = self._get_balance_snapshot_date()
+
         params = [
             # SELECT
             self.report_id.id,
@@ -480,35 +1440,27 @@ class AccountStandardLedger(models.TransientModel):
             self.init_balance_history,
             self.company_currency_id.id,
             report_object_id.id,
-            # WHERE
+            # FROM
             ('posted',) if self.target_move == 'posted' else ('posted', 'draft',),
             company.id,
             self.report_id.date_from,
+            use_snapshot, snapshot_date,
+            use_snapshot,
+            company.id,
+            snapshot_date,
             # HAVING
             self.init_balance_history,
             rouding, rouding, rouding, rouding,
         ]
 
-        self.env.cr.execute(query, tuple(params))
+        return self._execute(query, tuple(params))
 
     def _sql_init_balance(self):
-        company = self.company_id
+        companies = self._get_companies()
         # initial balance partner
         query = """
         INSERT INTO account_report_standard_ledger_line
             (report_id, create_uid, create_date, account_id, partner_id, group_by_key, line_type, view_type, date, debit, credit, balance, cumul_balance, company_currency_id, reconciled, report_object_id)
-
-        WITH matching_in_futur_before_init (id) AS
-        (
-        SELECT DISTINCT
-            afr.id as id
-        FROM
-            account_full_reconcile afr
-        INNER JOIN account_move_line aml ON aml.full_reconcile_id=afr.id
-        WHERE
-            aml.company_id = %s
-            AND aml.date >= %s
-        )
         SELECT
             %s AS report_id,
             %s AS create_uid,
@@ -531,21 +1483,50 @@ class AccountStandardLedger(models.TransientModel):
             MIN(ro.id) AS report_object_id
         FROM
             account_report_standard_ledger_report_object ro
-            INNER JOIN account_move_line aml ON (CASE WHEN %s = 'account' THEN aml.account_id = ro.object_id ELSE aml.partner_id = ro.object_id END)
-            LEFT JOIN account_account acc ON (aml.account_id = acc.id)
-            LEFT JOIN account_account_type acc_type ON (acc.user_type_id = acc_type.id)
-            LEFT JOIN account_move m ON (aml.move_id = m.id)
-            LEFT JOIN matching_in_futur_before_init mif ON (aml.full_reconcile_id = mif.id)
+            INNER JOIN (
+                SELECT
+                    aml.company_id, aml.account_id, aml.partner_id, aml.debit, aml.credit, aml.balance
+                FROM
+                    account_move_line aml
+                    LEFT JOIN account_account acc ON (aml.account_id = acc.id)
+                    LEFT JOIN account_account_type acc_type ON (acc.user_type_id = acc_type.id)
+                    LEFT JOIN account_move m ON (aml.move_id = m.id)
+                    LEFT JOIN account_full_reconcile afr ON (aml.full_reconcile_id = afr.id)
+                WHERE
+                    m.state IN %s
+                    AND aml.company_id = ANY(%s::int[])
+                    AND aml.date < %s
+                    AND acc_type.include_initial_balance = TRUE
+                    AND aml.journal_id = ANY(%s::int[])
+                    AND aml.account_id = ANY(%s::int[])
+                    AND (%s IN ('account', 'journal') OR (%s AND aml.partner_id IS NOT NULL) OR aml.partner_id = ANY(%s::int[]))
+                    -- matched before the start date
+                    AND ((%s AND acc.compacted = TRUE) OR acc.type_third_parties = 'no' OR (aml.full_reconcile_id IS NOT NULL AND afr.max_date < %s))
+                    -- lines already summed in the snapshots
+                    AND NOT (%s AND ((%s AND acc.compacted = TRUE) OR acc.type_third_parties = 'no') AND aml.date < %s)
+
+                UNION ALL
+
+                SELECT
+                    snap.company_id, snap.account_id, snap.partner_id, snap.debit, snap.credit, snap.balance
+                FROM
+                    account_report_balance_snapshot snap
+                    LEFT JOIN account_account acc ON (snap.account_id = acc.id)
+                    LEFT JOIN account_account_type acc_type ON (acc.user_type_id = acc_type.id)
+                WHERE
+                    %s
+                    AND snap.company_id = ANY(%s::int[])
+                    AND snap.period < %s
+                    AND acc_type.include_initial_balance = TRUE
+                    AND snap.account_id = ANY(%s::int[])
+                    AND (%s IN ('account', 'journal') OR (%s AND snap.partner_id IS NOT NULL) OR snap.partner_id = ANY(%s::int[]))
+                    AND ((%s AND acc.compacted = TRUE) OR acc.type_third_parties = 'no')
+            ) aml ON (CASE WHEN %s = 'account' THEN aml.account_id = ro.object_id ELSE aml.partner_id = ro.object_id END
+                      AND (ro.company_id IS NULL OR aml.company_id = ro.company_id))
        	WHERE
-            m.state IN %s
-            AND ro.report_id = %s
-            AND aml.company_id = %s
-            AND aml.date < %s
-            AND acc_type.include_initial_balance = TRUE
-            AND aml.journal_id IN %s
-            AND aml.account_id IN %s
-            AND (%s IN ('account', 'journal') OR aml.partner_id IN %s)
-            AND ((%s AND acc.compacted = TRUE) OR acc.type_third_parties = 'no' OR (aml.full_reconcile_id IS NOT NULL AND mif.id IS NULL))
+            ro.report_id = %s
+            AND ro.id BETWEEN %s AND %s
+            AND (%s OR ro.id = ANY(%s::int[]))
         GROUP BY
             group_by_key
         HAVING
@@ -555,12 +1536,9 @@ class AccountStandardLedger(models.TransientModel):
             END
         """
         rouding = self.company_currency_id.rounding / 2
+        use_snapshot, snapshot_date = self._get_balance_snapshot_date()
 
         params = [
-            # matching_in_futur
-            company.id,
-            self.report_id.date_from,
-
             # init_account_table
             # SELECT
             self.report_id.id,
@@ -571,56 +1549,48 @@ class AccountStandardLedger(models.TransientModel):
             self.init_balance_history,
             self.company_currency_id.id,
             # FROM
-            self.report_type,
-            # WHERE
             ('posted',) if self.target_move == 'posted' else ('posted', 'draft',),
-            self.report_id.id,
-            company.id,
+            companies.ids,
             self.report_id.date_from,
-            tuple(self.journal_ids.ids) if self.journal_ids else (None,),
-            tuple(self.account_ids.ids) if self.account_ids else (None,),
+            self.journal_ids.ids,
+            self.account_ids.ids,
+            self.report_type,
+            *self._get_partner_filter(),
+            self.compact_account, self.report_id.date_from,
+            use_snapshot, self.compact_account, snapshot_date,
+            # snapshot
+            use_snapshot,
+            companies.ids,
+            snapshot_date,
+            self.account_ids.ids,
             self.report_type,
-            tuple(self.partner_ids.ids) if self.partner_ids else (None,),
+            *self._get_partner_filter(),
             self.compact_account,
+            # ON
+            self.report_type,
+            # WHERE
+            self.report_id.id,
+            *self._get_object_filter(),
 
             # HAVING
             self.init_balance_history,
             rouding, rouding, rouding, rouding,
         ]
 
-        self.env.cr.execute(query, tuple(params))
+        return self._execute(query, tuple(params))
 
     def _sql_lines(self):
+        """ Insert the lines of the report objects, only a page of them in
+        a lazy report, see _compute_lazy_lines. """
+        # the last line inserted, and the number of lines of the page
+        after = self.env.context.get('report_lines_after') or (None, None, None)
+        limit = self.env.context.get('report_lines_limit')
         # lines_table
         query = """
         INSERT INTO account_report_standard_ledger_line
             (report_id, create_uid, create_date, account_id, analytic_account_id, line_type, view_type, journal_id, partner_id, move_id, move_line_id, date, date_maturity, debit, credit, balance, full_reconcile_id, reconciled, report_object_id, cumul_balance, current, age_30_days, age_60_days, age_90_days, age_120_days, older, company_currency_id, amount_currency, currency_id)
 
-        WITH matching_in_futur_before_init (id) AS
-        (
-            SELECT DISTINCT
-                afr.id AS id
-            FROM
-                account_full_reconcile afr
-            INNER JOIN account_move_line aml ON aml.full_reconcile_id=afr.id
-            WHERE
-                aml.company_id = %s
-                AND aml.date >= %s
-        ),
-
-        matching_in_futur_after_date_to (id) AS
-        (
-            SELECT DISTINCT
-                afr.id AS id
-            FROM
-                account_full_reconcile afr
-                INNER JOIN account_move_line aml ON aml.full_reconcile_id = afr.id
-            WHERE
-                aml.company_id = %s
-                AND aml.date > %s
-        ),
-
-        initial_balance (id, balance) AS
+        WITH initial_balance (id, balance) AS
         (
             SELECT
                 MIN(report_object_id) AS id,
@@ -638,11 +1608,11 @@ class AccountStandardLedger(models.TransientModel):
             (
                 SELECT
                     DATE %s AS date_current,
-                    DATE %s - INTEGER '30' AS date_less_30_days,
-                    DATE %s - INTEGER '60' AS date_less_60_days,
-                    DATE %s - INTEGER '90' AS date_less_90_days,
-                    DATE %s - INTEGER '120' AS date_less_120_days,
-                    DATE %s - INTEGER '150' AS date_older
+                    DATE %s - %s AS date_less_30_days,
+                    DATE %s - %s AS date_less_60_days,
+                    DATE %s - %s AS date_less_90_days,
+                    DATE %s - %s AS date_less_120_days,
+                    DATE %s - %s AS date_older
             )
 
         SELECT
@@ -663,12 +1633,12 @@ class AccountStandardLedger(models.TransientModel):
             aml.credit,
             aml.balance,
             aml.full_reconcile_id,
-            CASE WHEN aml.full_reconcile_id is NOT NULL AND NOT mifad.id IS NOT NULL THEN TRUE ELSE FALSE END AS reconciled,
+            CASE WHEN aml.full_reconcile_id IS NOT NULL AND afr.max_date <= %s THEN TRUE ELSE FALSE END AS reconciled,
             ro.id AS report_object_id,
             CASE
-                WHEN %s = 'account' THEN COALESCE(init.balance, 0) + (SUM(aml.balance) OVER (PARTITION BY aml.account_id ORDER BY aml.account_id, aml.date, aml.id))
-                WHEN %s = 'partner' THEN COALESCE(init.balance, 0) + (SUM(aml.balance) OVER (PARTITION BY aml.partner_id ORDER BY aml.partner_id, aml.date, aml.id))
-                ELSE SUM(aml.balance) OVER (PARTITION BY aml.journal_id ORDER BY aml.journal_id, aml.date, aml.id)
+                WHEN %s = 'account' THEN COALESCE(%s, init.balance, 0) + (SUM(aml.balance) OVER (PARTITION BY aml.account_id ORDER BY aml.account_id, aml.date, aml.id))
+                WHEN %s = 'partner' THEN COALESCE(%s, init.balance, 0) + (SUM(aml.balance) OVER (PARTITION BY ro.id ORDER BY ro.id, aml.date, aml.id))
+                ELSE COALESCE(%s, 0) + SUM(aml.balance) OVER (PARTITION BY aml.journal_id ORDER BY aml.journal_id, aml.date, aml.id)
             END AS cumul_balance,
             CASE WHEN aml.date_maturity > date_range.date_current THEN aml.balance END AS current,
             CASE WHEN aml.date_maturity > date_range.date_less_30_days AND aml.date_maturity <= date_range.date_current THEN aml.balance END AS age_30_days,
@@ -688,49 +1658,49 @@ class AccountStandardLedger(models.TransientModel):
                     WHEN %s = 'partner' THEN aml.partner_id = ro.object_id
                     WHEN %s = 'analytic' THEN aml.analytic_account_id = ro.object_id
                     ELSE aml.journal_id = ro.object_id
-                END)
+                END
+                AND (ro.company_id IS NULL OR aml.company_id = ro.company_id))
             LEFT JOIN account_journal j ON (aml.journal_id = j.id)
             LEFT JOIN account_account acc ON (aml.account_id = acc.id)
             LEFT JOIN account_account_type acc_type ON (acc.user_type_id = acc_type.id)
             LEFT JOIN account_move m ON (aml.move_id = m.id)
-            LEFT JOIN matching_in_futur_before_init mif ON (aml.full_reconcile_id = mif.id)
-            LEFT JOIN matching_in_futur_after_date_to mifad ON (aml.full_reconcile_id = mifad.id)
+            LEFT JOIN account_full_reconcile afr ON (aml.full_reconcile_id = afr.id)
             LEFT JOIN initial_balance init ON (ro.id = init.id)
         WHERE
             m.state IN %s
             AND ro.report_id = %s
-            AND aml.company_id = %s
+            AND ro.id BETWEEN %s AND %s
+            AND (%s OR ro.id = ANY(%s::int[]))
+            AND aml.company_id = ANY(%s::int[])
             AND (CASE
                     WHEN %s = 'journal' THEN aml.date >= %s
                     WHEN aml.date >= %s THEN %s != 'open'
-                    ELSE acc.type_third_parties IN ('supplier', 'customer') AND (aml.full_reconcile_id IS NULL OR mif.id IS NOT NULL)
+                    ELSE acc.type_third_parties IN ('supplier', 'customer') AND (aml.full_reconcile_id IS NULL OR afr.max_date >= %s)
                 END)
             AND aml.date <= %s
-            AND aml.journal_id IN %s
-            AND aml.account_id IN %s
-            AND (%s IN ('account','journal','analytic') OR aml.partner_id IN %s)
-            AND (%s != 'analytic' OR aml.analytic_account_id IN %s)
+            AND aml.journal_id = ANY(%s::int[])
+            AND aml.account_id = ANY(%s::int[])
+            AND (%s IN ('account','journal','analytic') OR (%s AND aml.partner_id IS NOT NULL) OR aml.partner_id = ANY(%s::int[]))
+            AND (%s != 'analytic' OR (%s AND aml.analytic_account_id IS NOT NULL) OR aml.analytic_account_id = ANY(%s::int[]))
             AND NOT (%s AND acc.compacted = TRUE)
-            AND (%s OR NOT (aml.full_reconcile_id is NOT NULL AND NOT mifad.id IS NOT NULL))
+            AND (%s OR NOT (aml.full_reconcile_id IS NOT NULL AND afr.max_date <= %s))
+            AND (%s::date IS NULL OR (aml.date, aml.id) > (%s::date, %s))
         ORDER BY
             aml.date, aml.id
+        LIMIT %s
         """
+        period_length = self.aged_period_length
         params = [
-            # matching_in_futur init
-            self.company_id.id,
-
-            self.report_id.date_from,
-
-            # matching_in_futur date_to
-            self.company_id.id,
-            self.report_id.date_to,
-
             # initial_balance
             self.report_id.id,
 
             # date_range
-            self.report_id.date_to, self.report_id.date_to, self.report_id.date_to, self.report_id.date_to,
-            self.report_id.date_to, self.report_id.date_to,
+            self.report_id.date_to,
+            self.report_id.date_to, period_length,
+            self.report_id.date_to, 2 * period_length,
+            self.report_id.date_to, 3 * period_length,
+            self.report_id.date_to, 4 * period_length,
+            self.report_id.date_to, 5 * period_length,
 
             # lines_table
             # SELECT
@@ -738,7 +1708,10 @@ class AccountStandardLedger(models.TransientModel):
             self.env.uid,
             self.report_id.date_from,
             self.report_id.date_from,
-            self.report_type, self.report_type,
+            self.report_id.date_to,
+            self.report_type, after[2],
+            self.report_type, after[2],
+            after[2],
             self.company_currency_id.id,
 
             # FROM
@@ -747,23 +1720,28 @@ class AccountStandardLedger(models.TransientModel):
             # WHERE
             ('posted',) if self.target_move == 'posted' else ('posted', 'draft',),
             self.report_id.id,
-            self.company_id.id,
+            *self._get_object_filter(),
+            self._get_companies().ids,
 
             self.report_type, self.report_id.date_from,
             self.report_id.date_from, self.ledger_type,
+            self.report_id.date_from,
             self.report_id.date_to,
-            tuple(self.journal_ids.ids) if self.journal_ids else (None,),
-            tuple(self.account_ids.ids) if self.account_ids else (None,),
+            self.journal_ids.ids,
+            self.account_ids.ids,
             self.report_type,
-            tuple(self.partner_ids.ids) if self.partner_ids else (None,),
+            *self._get_partner_filter(),
             self.report_type,
-            tuple(self.analytic_account_ids.ids) if self.analytic_account_ids else (None,),
+            *self._get_analytic_account_filter(),
             self.compact_account,
-            self.reconciled,
+            self.reconciled, self.report_id.date_to,
+            after[0], after[0], after[1],
 
+            # LIMIT
+            limit,
         ]
 
-        self.env.cr.execute(query, tuple(params))
+        return self._execute(query, tuple(params))
 
     def _sql_lines_compacted(self):
         query = """
@@ -809,11 +1787,13 @@ class AccountStandardLedger(models.TransientModel):
         WHERE
             m.state IN %s
             AND ro.report_id = %s
-            AND aml.company_id = %s
+            AND ro.id BETWEEN %s AND %s
+            AND (%s OR ro.id = ANY(%s::int[]))
+            AND aml.company_id = ANY(%s::int[])
             AND aml.date >= %s
             AND aml.date <= %s
-            AND aml.journal_id IN %s
-            AND aml.account_id IN %s
+            AND aml.journal_id = ANY(%s::int[])
+            AND aml.account_id = ANY(%s::int[])
             AND (%s AND acc.compacted = TRUE)
         GROUP BY
             aml.account_id
@@ -833,20 +1813,21 @@ class AccountStandardLedger(models.TransientModel):
             # WHERE
             ('posted',) if self.target_move == 'posted' else ('posted', 'draft',),
             self.report_id.id,
-            self.company_id.id,
+            *self._get_object_filter(),
+            self._get_companies().ids,
             self.report_id.date_from,
             self.report_id.date_to,
-            tuple(self.journal_ids.ids) if self.journal_ids else (None,),
-            tuple(self.account_ids.ids) if self.account_ids else (None,),
+            self.journal_ids.ids,
+            self.account_ids.ids,
             self.compact_account,
         ]
 
-        self.env.cr.execute(query, tuple(params))
+        return self._execute(query, tuple(params))
 
     def _sql_total(self):
         query = """
         INSERT INTO account_report_standard_ledger_line
-            (report_id, create_uid, create_date, account_id, partner_id, journal_id, analytic_account_id, line_type, view_type, date, debit, credit, balance, cumul_balance, report_object_id, current, age_30_days, age_60_days, age_90_days, age_120_days, older, company_currency_id)
+            (report_id, create_uid, create_date, account_id, partner_id, journal_id, analytic_account_id, line_type, view_type, date, debit, credit, balance, cumul_balance, report_object_id, current, age_30_days, age_60_days, age_90_days, age_120_days, older, company_currency_id, line_count)
         SELECT
             %s AS report_id,
             %s AS create_uid,
@@ -869,12 +1850,15 @@ class AccountStandardLedger(models.TransientModel):
             COALESCE(SUM(age_90_days), 0) AS age_90_days,
             COALESCE(SUM(age_120_days), 0) AS age_120_days,
             COALESCE(SUM(older), 0) AS older,
-            %s AS company_currency_id
+            %s AS company_currency_id,
+            COUNT(*) AS line_count
         FROM
             account_report_standard_ledger_line
         WHERE
             report_id = %s
             AND report_object_id IS NOT NULL
+            AND report_object_id BETWEEN %s AND %s
+            AND (%s OR report_object_id = ANY(%s::int[]))
         GROUP BY
             report_object_id
         ORDER BY
@@ -890,9 +1874,147 @@ class AccountStandardLedger(models.TransientModel):
 
             # WHERE
             self.report_id.id,
+            *self._get_object_filter(),
+        ]
+        return self._execute(query, tuple(params))
+
+    def _sql_summary_total(self):
+        """ Trial balance: compute the total of each report object by
+        aggregating its initial balance and its move lines, without
+        inserting the lines. """
+        query = """
+        INSERT INTO account_report_standard_ledger_line
+            (report_id, create_uid, create_date, account_id, partner_id, journal_id, analytic_account_id, line_type, view_type, date, debit, credit, balance, cumul_balance, report_object_id, current, age_30_days, age_60_days, age_90_days, age_120_days, older, company_currency_id, line_count)
+        SELECT
+            %s AS report_id,
+            %s AS create_uid,
+            NOW() AS create_date,
+            CASE WHEN %s = 'account' THEN MIN(ro.object_id) ELSE NULL END AS account_id,
+            CASE WHEN %s = 'partner' THEN MIN(ro.object_id) ELSE NULL END AS partner_id,
+            CASE WHEN %s = 'journal' THEN MIN(ro.object_id) ELSE NULL END AS journal_id,
+            CASE WHEN %s = 'analytic' THEN MIN(ro.object_id) ELSE NULL END AS analytic_account_id,
+            '4_total' AS line_type,
+            'total' AS view_type,
+            %s AS date,
+            COALESCE(SUM(l.debit), 0) AS debit,
+            COALESCE(SUM(l.credit), 0) AS credit,
+            COALESCE(SUM(l.balance), 0) AS balance,
+            COALESCE(SUM(l.balance), 0) AS cumul_balance,
+            ro.id AS report_object_id,
+            COALESCE(SUM(l.balance) FILTER (WHERE l.date_maturity > DATE %s), 0) AS current,
+            COALESCE(SUM(l.balance) FILTER (WHERE l.date_maturity > DATE %s - %s AND l.date_maturity <= DATE %s), 0) AS age_30_days,
+            COALESCE(SUM(l.balance) FILTER (WHERE l.date_maturity > DATE %s - %s AND l.date_maturity <= DATE %s - %s), 0) AS age_60_days,
+            COALESCE(SUM(l.balance) FILTER (WHERE l.date_maturity > DATE %s - %s AND l.date_maturity <= DATE %s - %s), 0) AS age_90_days,
+            COALESCE(SUM(l.balance) FILTER (WHERE l.date_maturity > DATE %s - %s AND l.date_maturity <= DATE %s - %s), 0) AS age_120_days,
+            COALESCE(SUM(l.balance) FILTER (WHERE l.date_maturity <= DATE %s - %s), 0) AS older,
+            %s AS company_currency_id,
+            -- the journal items of a compacted account are on one line
+            COUNT(*) FILTER (WHERE l.compacted IS NOT TRUE) + CASE WHEN BOOL_OR(l.compacted) THEN 1 ELSE 0 END AS line_count
+        FROM
+            account_report_standard_ledger_report_object ro
+            INNER JOIN (
+                -- initial balances
+                SELECT
+                    report_object_id, debit, credit, balance, NULL::date AS date_maturity, FALSE AS compacted
+                FROM
+                    account_report_standard_ledger_line
+                WHERE
+                    report_id = %s
+                    AND line_type = '0_init'
+
+                UNION ALL
+
+                -- same lines as _sql_lines and _sql_lines_compacted
+                SELECT
+                    ro.id, aml.debit, aml.credit, aml.balance,
+                    CASE WHEN %s AND acc.compacted = TRUE THEN NULL ELSE aml.date_maturity END AS date_maturity,
+                    %s AND acc.compacted = TRUE AS compacted
+                FROM
+                    account_report_standard_ledger_report_object ro
+                    INNER JOIN account_move_line aml ON (
+                        CASE
+                            WHEN %s = 'account' THEN aml.account_id = ro.object_id
+                            WHEN %s = 'partner' THEN aml.partner_id = ro.object_id
+                            WHEN %s = 'analytic' THEN aml.analytic_account_id = ro.object_id
+                            ELSE aml.journal_id = ro.object_id
+                        END
+                        AND (ro.company_id IS NULL OR aml.company_id = ro.company_id))
+                    LEFT JOIN account_account acc ON (aml.account_id = acc.id)
+                    LEFT JOIN account_move m ON (aml.move_id = m.id)
+                    LEFT JOIN account_full_reconcile afr ON (aml.full_reconcile_id = afr.id)
+                WHERE
+                    m.state IN %s
+                    AND ro.report_id = %s
+                    AND ro.id BETWEEN %s AND %s
+                    AND (%s OR ro.id = ANY(%s::int[]))
+                    AND aml.company_id = ANY(%s::int[])
+                    AND (CASE
+                            WHEN %s = 'journal' THEN aml.date >= %s
+                            WHEN aml.date >= %s THEN %s != 'open'
+                            ELSE acc.type_third_parties IN ('supplier', 'customer') AND (aml.full_reconcile_id IS NULL OR afr.max_date >= %s)
+                        END)
+                    AND aml.date <= %s
+                    AND aml.journal_id = ANY(%s::int[])
+                    AND aml.account_id = ANY(%s::int[])
+                    AND (%s IN ('account','journal','analytic') OR (%s AND aml.partner_id IS NOT NULL) OR aml.partner_id = ANY(%s::int[]))
+                    AND (%s != 'analytic' OR (%s AND aml.analytic_account_id IS NOT NULL) OR aml.analytic_account_id = ANY(%s::int[]))
+                    -- compacted accounts: the lines before the start date are in the initial balance
+                    AND NOT (%s AND acc.compacted = TRUE AND aml.date < %s)
+                    AND (%s OR NOT (aml.full_reconcile_id IS NOT NULL AND afr.max_date <= %s))
+            ) l ON (l.report_object_id = ro.id)
+        WHERE
+            ro.report_id = %s
+            AND ro.id BETWEEN %s AND %s
+            AND (%s OR ro.id = ANY(%s::int[]))
+        GROUP BY
+            ro.id
+        ORDER BY
+            ro.id
+        """
+        date_to = self.report_id.date_to
+        period_length = self.aged_period_length
+        params = [
+            # SELECT
+            self.report_id.id,
+            self.env.uid,
+            self.report_type, self.report_type, self.report_type, self.report_type,
+            self.report_id.date_from,
+            date_to,
+            date_to, period_length, date_to,
+            date_to, 2 * period_length, date_to, period_length,
+            date_to, 3 * period_length, date_to, 2 * period_length,
+            date_to, 4 * period_length, date_to, 3 * period_length,
+            date_to, 4 * period_length,
+            self.company_currency_id.id,
 
+            # FROM
+            # initial balances
+            self.report_id.id,
+            # lines
+            self.compact_account, self.compact_account,
+            self.report_type, self.report_type, self.report_type,
+            ('posted',) if self.target_move == 'posted' else ('posted', 'draft',),
+            self.report_id.id,
+            *self._get_object_filter(),
+            self._get_companies().ids,
+            self.report_type, self.report_id.date_from,
+            self.report_id.date_from, self.ledger_type,
+            self.report_id.date_from,
+            date_to,
+            self.journal_ids.ids,
+            self.account_ids.ids,
+            self.report_type,
+            *self._get_partner_filter(),
+            self.report_type,
+            *self._get_analytic_account_filter(),
+            self.compact_account, self.report_id.date_from,
+            self.reconciled, date_to,
+
+            # WHERE
+            self.report_id.id,
+            *self._get_object_filter(),
         ]
-        self.env.cr.execute(query, tuple(params))
+        return self._execute(query, tuple(params))
 
     def _sql_super_total(self):
         query = """
@@ -930,11 +2052,159 @@ class AccountStandardLedger(models.TransientModel):
             self.company_currency_id.id,
             self.report_id.id,
         ]
-        self.env.cr.execute(query, tuple(params))
+        return self._execute(query, tuple(params))
+
+    def _sql_comparison(self):
+        """ Debit, credit and balance of each account in each compared
+        period, as in a trial balance of the period, computed in one scan of
+        the entries with one aggregate filtered by period: the entries of
+        the period, with the entries before it for the accounts with an
+        initial balance, and the earnings before it for the unaffected
+        earnings accounts. """
+        periods = self._get_comparison_periods()
+        amount = ("COALESCE(SUM(aml.{field}) FILTER (WHERE aml.date <= p.date_to[{index}] AND CASE "
+                  "WHEN src.unaffected THEN aml.date < p.date_from[{index}] "
+                  "ELSE acc_type.include_initial_balance OR aml.date >= p.date_from[{index}] END), 0)")
+        query = """
+        INSERT INTO account_report_standard_ledger_comparison
+            (report_id, create_uid, create_date, report_object_id, sequence, name, debit, credit, balance, company_currency_id)
+
+        WITH periods AS (
+            SELECT %s::date[] AS date_from, %s::date[] AS date_to
+        ),
+
+        amounts AS (
+            SELECT
+                ro.id AS report_object_id,
+                ARRAY[{debit}] AS debit,
+                ARRAY[{credit}] AS credit,
+                ARRAY[{balance}] AS balance
+            FROM
+                periods p,
+                account_move_line aml
+                LEFT JOIN account_move m ON (aml.move_id = m.id)
+                LEFT JOIN account_account acc ON (aml.account_id = acc.id)
+                LEFT JOIN account_account_type acc_type ON (acc.user_type_id = acc_type.id)
+                -- the earnings are read a second time for the unaffected
+                -- earnings account of their company
+                CROSS JOIN LATERAL (VALUES
+                    (aml.account_id, FALSE),
+                    ((%s::int[])[array_position(%s::int[], aml.company_id)], TRUE)
+                ) src (account_id, unaffected)
+                INNER JOIN account_report_standard_ledger_report_object ro ON (ro.object_id = src.account_id)
+            WHERE
+                ro.report_id = %s
+                AND ro.id BETWEEN %s AND %s
+                AND (%s OR ro.id = ANY(%s::int[]))
+                AND m.state IN %s
+                AND aml.company_id = ANY(%s::int[])
+                AND aml.date <= %s
+                AND (CASE
+                        WHEN src.unaffected THEN NOT acc_type.include_initial_balance
+                        ELSE aml.journal_id = ANY(%s::int[]) AND aml.account_id = ANY(%s::int[])
+                    END)
+            GROUP BY
+                ro.id
+        )
+
+        SELECT
+            %s AS report_id,
+            %s AS create_uid,
+            NOW() AS create_date,
+            a.report_object_id,
+            t.sequence,
+            (%s::varchar[])[t.sequence] AS name,
+            t.debit,
+            t.credit,
+            t.balance,
+            %s AS company_currency_id
+        FROM
+            amounts a,
+            unnest(a.debit, a.credit, a.balance) WITH ORDINALITY t (debit, credit, balance, sequence)
+        """.format(**{field: ', '.join(amount.format(field=field, index=index) for index in range(1, len(periods) + 1))
+                      for field in ('debit', 'credit', 'balance')})
+
+        companies = self._get_companies()
+        unaffected_earnings_type = self.env.ref('account.data_unaffected_earnings')
+        unaffected_earnings_accounts = [
+            self.env['account.account'].search([('company_id', '=', company.id),
+                                                ('user_type_id', '=', unaffected_earnings_type.id)], limit=1).id or None
+            for company in companies]
+        params = [
+            # periods
+            [date_from for name, date_from, date_to in periods],
+            [date_to for name, date_from, date_to in periods],
+            # FROM
+            unaffected_earnings_accounts, companies.ids,
+            # WHERE
+            self.report_id.id,
+            *self._get_object_filter(),
+            ('posted',) if self.target_move == 'posted' else ('posted', 'draft',),
+            companies.ids,
+            max(date_to for name, date_from, date_to in periods),
+            self.journal_ids.ids,
+            self.account_ids.ids,
+            # SELECT
+            self.report_id.id,
+            self.env.uid,
+            [name for name, date_from, date_to in periods],
+            self.company_currency_id.id,
+        ]
+
+        return self._execute(query, tuple(params))
+
+    def _get_comparison_periods(self):
+        """ Name, start and end dates of the compared periods of the General
+        Ledger, in chronological order. """
+        if self.ledger_type != 'general' or not self.comparison:
+            return []
+        if self.comparison == 'periode':
+            return [(periode.name, periode.date_from, periode.date_to)
+                    for periode in self.comparison_periode_ids.sorted('date_from')]
+        if not self.date_from or not self.date_to:
+            return []
+        periods = []
+        month = self.date_from.replace(day=1)
+        while month <= self.date_to:
+            month_end = month.replace(day=calendar.monthrange(month.year, month.month)[1])
+            periods.append((month.strftime('%m/%Y'), max(month, self.date_from), min(month_end, self.date_to)))
+            month = month_end + timedelta(days=1)
+        return periods
+
+    def _get_date_max(self):
+        """ Last date of the entries of the report, compared periods
+        included. """
+        dates = [self.date_to] + [date_to for name, date_from, date_to in self._get_comparison_periods()]
+        return max(dates) if all(dates) else fields.Date.to_date("2099-01-01")
+
+    def _get_comparison(self):
+        """ Names of the compared periods, and the name of each object of the
+        report with its (debit, credit, balance) by period. """
+        self.env['account.move.line'].check_access_rights('read')
+        periods = [name for name, date_from, date_to in self._get_comparison_periods()]
+        if not periods:
+            return [], []
+        self.env.cr.execute("""SELECT
+                ro.id, ro.name, c.sequence, c.debit, c.credit, c.balance
+            FROM
+                account_report_standard_ledger_comparison c
+                INNER JOIN account_report_standard_ledger_report_object ro ON (ro.id = c.report_object_id)
+            WHERE
+                c.report_id = %s
+            ORDER BY
+                ro.name, ro.id, c.sequence""", (self.report_id.id,))
+        rows = []
+        for dummy, group in groupby(self.env.cr.fetchall(), key=lambda row: row[0]):
+            group = list(group)
+            amounts = [(0.0, 0.0, 0.0)] * len(periods)
+            for row in group:
+                amounts[row[2] - 1] = (row[3], row[4], row[5])
+            rows.append((group[0][1], amounts))
+        return periods, rows
 
     def _search_account(self):
         ledger_type = self.ledger_type
-        domain = [('deprecated', '=', False), ('company_id', '=', self.company_id.id)]
+        domain = [('deprecated', '=', False), ('company_id', 'in', self._get_companies().ids)]
         if ledger_type in ('partner', 'aged',):
             result_selection = self.result_selection
             if result_selection == 'supplier':
@@ -956,18 +2226,31 @@ class AccountStandardLedger(models.TransientModel):
 
     def _search_analytic_account(self):
         if self.ledger_type == 'analytic':
-            if self.analytic_account_select_ids:
-                return self.analytic_account_select_ids
-            else:
-                return self.env['account.analytic.account'].search([])
-        return False
+            return self.analytic_account_select_ids
+        return self.env['account.analytic.account']
 
     def _search_partner(self):
         if self.ledger_type in ('partner', 'aged'):
-            if self.partner_select_ids:
-                return self.partner_select_ids
-            return self.env['res.partner'].search([])
-        return False
+            return self.partner_select_ids
+        return self.env['res.partner']
+
+    def _get_companies(self):
+        """ Companies of the entries of the report. """
+        return self.company_ids or self.company_id
+
+    def _is_consolidated(self):
+        """ Whether the objects of the report are split by company. """
+        return len(self._get_companies()) > 1
+
+    def _get_partner_filter(self):
+        """ Return the parameters of the partner predicate: whether all the
+        items with a partner are reported, else the ids of the partners. """
+        return self.report_type == 'partner' and not self.partner_ids, self.partner_ids.ids
+
+    def _get_analytic_account_filter(self):
+        """ Same as `_get_partner_filter` for the analytic accounts. """
+        analytic_accounts = self._search_analytic_account()
+        return self.report_type == 'analytic' and not analytic_accounts, analytic_accounts.ids
 
     def _get_name_report(self):
         report_name = D_LEDGER[self.ledger_type]['name']
@@ -975,11 +2258,12 @@ class AccountStandardLedger(models.TransientModel):
             report_name += _(' Balance')
         return report_name
 
-    def _sql_get_line_for_report(self, type_l, report_object=None):
-        self.env['account.move.line'].check_access_rights('read')
+    def _get_line_for_report_query(self, type_l, report_object=None, order_by_object=False):
         query = """SELECT
                     raml.report_object_id AS report_object_id,
+                    ro.name AS object_name,
                     raml.view_type AS view_type,
+                    raml.line_type AS line_type,
                     CASE
                         WHEN %s = 'account' THEN acc.code
                         WHEN %s = 'journal' THEN acj.code
@@ -1014,6 +2298,7 @@ class AccountStandardLedger(models.TransientModel):
                     raml.date AS date,
                     raml.date_maturity AS date_maturity,
                     raml.amount_currency AS amount_currency,
+                    raml.currency_id AS currency_id,
                     cr.excel_format AS currency,
                     CASE
                         WHEN raml.full_reconcile_id IS NOT NULL THEN (CASE WHEN raml.reconciled = TRUE THEN afr.name ELSE '*' END)
@@ -1021,6 +2306,7 @@ class AccountStandardLedger(models.TransientModel):
                     END AS matching_number
                 FROM
                     account_report_standard_ledger_line raml
+                    LEFT JOIN account_report_standard_ledger_report_object ro ON (ro.id = raml.report_object_id)
                     LEFT JOIN account_account acc ON (acc.id = raml.account_id)
                     LEFT JOIN account_journal acj ON (acj.id = raml.journal_id)
                     LEFT JOIN res_partner rep ON (rep.id = raml.partner_id)
@@ -1031,26 +2317,69 @@ class AccountStandardLedger(models.TransientModel):
                     LEFT JOIN res_currency cr ON (raml.currency_id = cr.id)
                 WHERE
                     raml.report_id = %s
-                    AND (%s OR raml.report_object_id = %s)
+                    AND (%s OR raml.report_object_id IN %s)
                     AND raml.line_type IN %s
                 ORDER BY
-                    raml.id
-                """
+                    {order_by}
+                """.format(order_by='ro.name, ro.id, raml.id' if order_by_object else 'raml.id')
         params = [
             self.report_type, self.report_type, self.report_type, self.report_type, self.report_type, self.report_type,
             self.report_id.id,
             True if report_object is None else False,
-            report_object,
+            tuple(report_object) if isinstance(report_object, (list, tuple)) else (report_object,),
             type_l
         ]
+        return query, tuple(params)
 
-        self.env.cr.execute(query, tuple(params))
+    def _get_aged_labels(self):
+        """ Titles of the Aged Balance columns, from not due to older. """
+        period_length = self.aged_period_length
+        labels = [_('Not Due')]
+        for i in range(4):
+            labels.append('%s-%s' % (i * period_length, (i + 1) * period_length))
+        labels.append(_('Older'))
+        return labels
+
+    def _sql_get_line_for_report(self, type_l, report_object=None):
+        self.env['account.move.line'].check_access_rights('read')
+        query, params = self._get_line_for_report_query(type_l, report_object=report_object)
+        self.env.cr.execute(query, params)
         return self.env.cr.dictfetchall()
 
+    def _sql_iter_line_for_report(self, type_l, report_object=None, order_by_object=False, batch_size=None):
+        """ Same lines as `_sql_get_line_for_report`, but read through a
+        server-side cursor and yielded as namedtuples, `batch_size` lines per
+        round trip, so that memory does not grow with the report size.
+        With `order_by_object`, lines come grouped by report object, in the
+        order of `report_object_ids`. `report_object` is the id of a report
+        object or a list of ids.
+        """
+        self.env['account.move.line'].check_access_rights('read')
+        if not batch_size:
+            batch_size = int(self.env['ir.config_parameter'].sudo().get_param(
+                'account_standard_report.stream_batch_size', STREAM_BATCH_SIZE))
+        query, params = self._get_line_for_report_query(type_l, report_object=report_object,
+                                                        order_by_object=order_by_object)
+        # named cursor on the same connection: it sees the lines of the
+        # current transaction
+        name = 'standard_report_%s' % uuid.uuid4().hex
+        with closing(self.env.cr._cnx.cursor(name, cursor_factory=NamedTupleCursor)) as cr:
+            cr.execute(query, params)
+            while True:
+                rows = cr.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+
     def _format_total(self):
         if not self.company_currency_id:
             return
-        lines = self.report_id.line_total_ids + self.report_id.line_super_total_id
+        lines = self.report_id.line_total_ids
+        object_ids = self.env.context.get('report_refresh_object_ids')
+        if object_ids is not None:
+            lines = lines.filtered(lambda line: line.report_object_id.id in object_ids)
+        lines += self.report_id.line_super_total_id
         for line in lines:
             line.write({
                 'debit': self.company_currency_id.round(line.debit) + 0.0,